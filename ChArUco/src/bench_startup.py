@@ -0,0 +1,89 @@
+import time
+_T0 = time.perf_counter()  # before any heavy import of the child process
+
+import os
+import sys
+import glob
+import json
+import argparse
+import subprocess
+import numpy as np
+
+# name → (run_cache setting, remove the cache file before the run)
+MODES = {
+    "no cache": (False, False),
+    "cold cache": (True, True),
+    "warm cache": (True, False),
+}
+
+
+def child(img_path, run_cache):
+    """
+    One fresh process: imports, run context, first image. Prints the times (s from
+    the first line of this script) as JSON.
+    """
+    from utils import parse_args_from_json
+    from main import RunContext, measure_image
+    t_import = time.perf_counter()
+
+    args = parse_args_from_json()
+    args.run_cache = run_cache
+    ctx = RunContext(args)
+    t_context = time.perf_counter()
+
+    _, pose, warning = measure_image(img_path, ctx)
+    if pose is None:
+        raise RuntimeError(f"{img_path}: {warning}")
+    ctx.schema.compute_poses([pose])
+    t_first = time.perf_counter()
+    print(json.dumps({
+        "imports": t_import - _T0,
+        "context": t_context - t_import,
+        "first_image": t_first - t_context,
+        "modules": sorted(m for m in ("scipy", "yaml", "pandas", "cProfile") if m in sys.modules),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time-to-first-result of a fresh measurement process.")
+    parser.add_argument("--image", help="image measured (default: first image of input_dir)")
+    parser.add_argument("--runs", type=int, default=5, help="processes per mode")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--run-cache", type=int, default=1, help=argparse.SUPPRESS)
+    cli = parser.parse_args()
+
+    if cli.child:
+        child(cli.image, bool(cli.run_cache))
+        return
+
+    from utils import parse_args_from_json
+    from context_cache import CACHE_PATH
+    img_path = cli.image
+    if img_path is None:
+        args = parse_args_from_json()
+        img_path = sorted(glob.glob(os.path.join(args.input_dir, "*.*")))[0]
+
+    print(f"[INFO] {cli.runs} processi per modalità, immagine {img_path}")
+    print(f"{'mode':<12}{'total ms':>10}{'imports':>10}{'context':>10}{'1st img':>10}  heavy modules loaded")
+    for mode, (run_cache, remove) in MODES.items():
+        walls, parts, modules = [], [], []
+        for _ in range(cli.runs):
+            if remove and os.path.exists(CACHE_PATH):
+                os.remove(CACHE_PATH)
+            start_t = time.perf_counter()
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", "--image", img_path, "--run-cache", str(int(run_cache))],
+                capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+            )
+            # time-to-first-result as seen from outside, interpreter startup included
+            walls.append(time.perf_counter() - start_t)
+            res = json.loads(out.stdout.strip().splitlines()[-1])
+            parts.append([res["imports"], res["context"], res["first_image"]])
+            modules = res["modules"]
+        imports, context, first = np.median(parts, axis=0) * 1000.0
+        print(f"{mode:<12}{np.median(walls) * 1000.0:>10.1f}{imports:>10.1f}{context:>10.1f}{first:>10.1f}  "
+              f"{', '.join(modules) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,51 +3,128 @@ import numpy as np
 import cv2.aruco as aruco
 import os
 import json
+import time
+import hashlib
+import argparse
+import multiprocessing as mp
 
-def calibrate_from_images(image_folder, output_json_path):
-    aruco_dict = aruco.getPredefinedDictionary(aruco.DICT_5X5_100)
-    board = aruco.CharucoBoard((12, 9), 30, 22, aruco_dict)
+# Board used for the intrinsic calibration (12x9 squares of 30 mm, markers of 22 mm)
+CALIB_BOARD_SIZE = (12, 9)
+CALIB_SQUARE_LENGTH = 30
+CALIB_MARKER_LENGTH = 22
+CALIB_DICT = aruco.DICT_5X5_100
 
-    all_corners = []
-    all_ids = []
-    image_size = None
+# A frame is used only if at least this many ChArUco corners are found
+MIN_CHARUCO_CORNERS = 20
 
-    image_files = [f for f in os.listdir(image_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.tiff'))]
-    if len(image_files) == 0:
-        print("❌ Nessuna immagine trovata nella cartella.")
-        return
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tiff')
 
-    for filename in image_files:
-        path = os.path.join(image_folder, filename)
-        img = cv2.imread(path)
-        if img is None:
-            print(f"⚠️ Immagine non valida: {filename}")
-            continue
+# Bump when the detection changes, so that old cache entries are not reused
+DETECTION_VERSION = 1
 
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        corners, ids, _ = aruco.detectMarkers(gray, aruco_dict)
+# Frame selection: image-plane coverage grid (cells x, y) and tilt bins
+COVERAGE_GRID = (8, 6)
+TILT_BIN_DEG = 15.0
+# Weights of the greedy score: new coverage cells, new tilt bin, corner count
+SELECTION_WEIGHTS = (1.0, 0.5, 0.25)
 
-        if ids is not None and len(ids) > 0:
-            retval, charuco_corners, charuco_ids = aruco.interpolateCornersCharuco(corners, ids, gray, board)
 
-            if retval is not None and retval > 20:
-                all_corners.append(charuco_corners)
-                all_ids.append(charuco_ids)
-                print(f"✅ Rilevata board valida in: {filename}")
-                if image_size is None:
-                    image_size = gray.shape[::-1]
-            else:
-                print(f"❌ Board non sufficientemente visibile in: {filename}")
-        else:
-            print(f"❌ Nessun marker ArUco trovato in: {filename}")
+def make_calibration_board():
+    aruco_dict = aruco.getPredefinedDictionary(CALIB_DICT)
+    board = aruco.CharucoBoard(CALIB_BOARD_SIZE, CALIB_SQUARE_LENGTH, CALIB_MARKER_LENGTH, aruco_dict)
+    return aruco_dict, board
 
-    if len(all_corners) < 5:
-        print("❌ Pochi frame validi per calibrazione.")
-        return
 
-    print("⚙️ Calibrazione in corso...")
-    
-    flags = cv2.CALIB_RATIONAL_MODEL
+def board_key():
+    """
+    Identity of the board and detection parameters, part of every cache key.
+    """
+    return f"v{DETECTION_VERSION}|{CALIB_BOARD_SIZE}|{CALIB_SQUARE_LENGTH}|{CALIB_MARKER_LENGTH}|{CALIB_DICT}|{MIN_CHARUCO_CORNERS}"
+
+
+def _detect(img_bytes):
+    """
+    Marker detection + ChArUco interpolation of one encoded image.
+    Returns (status, charuco_corners, charuco_ids, image_size):
+    status is "ok", "few" (board not visible enough), "none" (no marker) or "invalid".
+    """
+    gray = cv2.imdecode(np.frombuffer(img_bytes, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    empty = (np.zeros((0, 1, 2), np.float32), np.zeros((0, 1), np.int32))
+    if gray is None:
+        return "invalid", *empty, (0, 0)
+    image_size = gray.shape[::-1]
+
+    aruco_dict, board = make_calibration_board()
+    corners, ids, _ = aruco.detectMarkers(gray, aruco_dict)
+    if ids is None or len(ids) == 0:
+        return "none", *empty, image_size
+
+    retval, charuco_corners, charuco_ids = aruco.interpolateCornersCharuco(corners, ids, gray, board)
+    if retval is None or retval <= MIN_CHARUCO_CORNERS:
+        return "few", *empty, image_size
+    return "ok", charuco_corners, charuco_ids, image_size
+
+
+def detect_calibration_image(path, cache_dir=None):
+    """
+    ChArUco corners/ids of one calibration image, from the cache when the same image
+    (content hash) was already detected with the same board, otherwise detected and stored.
+    Returns (filename, status, charuco_corners, charuco_ids, image_size, cached).
+    """
+    filename = os.path.basename(path)
+    with open(path, "rb") as f:
+        img_bytes = f.read()
+
+    cache_path = None
+    if cache_dir is not None:
+        key = hashlib.sha1(img_bytes + board_key().encode()).hexdigest()
+        cache_path = os.path.join(cache_dir, f"{key}.npz")
+        if os.path.exists(cache_path):
+            with np.load(cache_path) as cached:
+                return (filename, str(cached["status"]), cached["corners"], cached["ids"],
+                        tuple(int(v) for v in cached["image_size"]), True)
+
+    status, corners, ids, image_size = _detect(img_bytes)
+    if cache_path is not None:
+        # write + rename, so that an interrupted run never leaves a truncated entry
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, status=status, corners=corners, ids=ids, image_size=np.array(image_size))
+        os.replace(tmp_path, cache_path)
+    return filename, status, corners, ids, image_size, False
+
+
+def _init_worker():
+    # one OpenCV thread per process, N processes for N cores
+    cv2.setNumThreads(1)
+
+
+def _detect_task(task):
+    return detect_calibration_image(*task)
+
+
+def detect_calibration_frames(image_folder, cache_dir=None, workers=0):
+    """
+    Detects the board in every image of image_folder (sorted by name) over a process pool.
+    Returns the list of detections (as detect_calibration_image), in file order.
+    """
+    image_files = sorted(f for f in os.listdir(image_folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+    tasks = [(os.path.join(image_folder, f), cache_dir) for f in image_files]
+    if not tasks:
+        return []
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
+    if workers == 1:
+        return [_detect_task(t) for t in tasks]
+    with mp.Pool(min(workers, len(tasks)), initializer=_init_worker) as pool:
+        return pool.map(_detect_task, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+
+
+def calibrate_from_detections(all_corners, all_ids, image_size, flags=cv2.CALIB_RATIONAL_MODEL):
+    """
+    Only the calibrateCameraCharuco solve. Returns (rms, camera_matrix, dist_coeffs).
+    """
+    _, board = make_calibration_board()
     rms, camera_matrix, dist_coeffs, rvecs, tvecs = aruco.calibrateCameraCharuco(
         charucoCorners=all_corners,
         charucoIds=all_ids,
@@ -57,9 +134,155 @@ def calibrate_from_images(image_folder, output_json_path):
         distCoeffs=None,
         flags=flags
     )
+    return rms, camera_matrix, dist_coeffs
+
+
+def view_features(charuco_corners, charuco_ids, image_size, grid=COVERAGE_GRID):
+    """
+    Scores of one detected view for frame selection:
+    - cells: bool mask of the coverage grid cells touched by the board (its corner hull)
+    - tilt_bin: (tilt magnitude bin, tilt direction quadrant) of the board plane, from the
+      board→image homography with a rough pinhole guess (f = image width, centred principal point)
+    - n_corners: ChArUco corners found
+    """
+    _, board = make_calibration_board()
+    w, h = image_size
+    pts = charuco_corners.reshape(-1, 2).astype(np.float32)
+
+    gx, gy = grid
+    mask = np.zeros((gy * 8, gx * 8), dtype=np.uint8)
+    hull = cv2.convexHull((pts * [gx * 8 / w, gy * 8 / h]).astype(np.int32))
+    cv2.fillConvexPoly(mask, hull, 1)
+    cells = mask.reshape(gy, 8, gx, 8).max(axis=(1, 3)).astype(bool).ravel()
 
-    # Estrazione dei parametri nel formato desiderato
-    k = dist_coeffs.flatten()
+    obj = board.getChessboardCorners()[charuco_ids.flatten(), :2].astype(np.float32)
+    H, _ = cv2.findHomography(obj, pts)
+    K = np.array([[w, 0, w / 2.0], [0, w, h / 2.0], [0, 0, 1.0]])
+    r = np.linalg.solve(K, H)
+    r1, r2 = r[:, 0] / np.linalg.norm(r[:, 0]), r[:, 1] / np.linalg.norm(r[:, 1])
+    normal = np.cross(r1, r2)
+    normal /= np.linalg.norm(normal)
+    tilt = np.degrees(np.arccos(min(abs(normal[2]), 1.0)))
+    quadrant = int(np.sign(normal[0] * normal[2]) >= 0) * 2 + int(np.sign(normal[1] * normal[2]) >= 0)
+    tilt_bin = (int(tilt // TILT_BIN_DEG), quadrant if tilt >= TILT_BIN_DEG else 0)
+    return cells, tilt_bin, len(pts)
+
+
+def select_frames(views, image_size, target, grid=COVERAGE_GRID, weights=SELECTION_WEIGHTS):
+    """
+    Greedy choice of at most `target` views (list of (charuco_corners, charuco_ids)):
+    each step takes the view adding the most image-plane coverage cells, a tilt bin not
+    yet represented and many corners. Returns the chosen indices, in pick order.
+    """
+    feats = [view_features(c, i, image_size, grid) for c, i in views]
+    w_cells, w_tilt, w_count = weights
+    n_cells = feats[0][0].size
+    max_corners = max(f[2] for f in feats)
+    covered = np.zeros(n_cells, dtype=np.int32)
+    tilt_bins = set()
+    chosen, remaining = [], set(range(len(views)))
+    while remaining and len(chosen) < target:
+        def score(k):
+            cells, tilt_bin, n = feats[k]
+            # cells seen once more are still worth something (more constraints per region)
+            new_cells = np.sum(cells / (1.0 + covered)) / n_cells
+            return w_cells * new_cells + w_tilt * (tilt_bin not in tilt_bins) + w_count * n / max_corners
+        best = max(sorted(remaining), key=score)
+        chosen.append(best)
+        remaining.discard(best)
+        covered += feats[best][0]
+        tilt_bins.add(feats[best][1])
+    return chosen
+
+
+def reprojection_rms(all_corners, all_ids, camera_matrix, dist_coeffs):
+    """
+    Reprojection RMS (px) of all views with the given intrinsics, each view with its own
+    solvePnP pose: how well a calibration made on a subset explains the full set.
+    """
+    _, board = make_calibration_board()
+    sq_err, n = 0.0, 0
+    for corners, ids in zip(all_corners, all_ids):
+        obj, img = board.matchImagePoints(corners, ids)
+        ok, rvec, tvec = cv2.solvePnP(obj, img, camera_matrix, dist_coeffs)
+        if not ok:
+            continue
+        proj, _ = cv2.projectPoints(obj, rvec, tvec, camera_matrix, dist_coeffs)
+        sq_err += np.sum((proj.reshape(-1, 2) - img.reshape(-1, 2)) ** 2)
+        n += len(obj)
+    return np.sqrt(sq_err / n)
+
+
+def calibrate_from_images(image_folder, output_json_path, flags=cv2.CALIB_RATIONAL_MODEL, cache_dir=None, workers=0,
+                          max_frames=None, compare_full=False):
+    """
+    Intrinsic calibration from the ChArUco images of image_folder, saved as
+    IntrinsicCalibration.OpenCV JSON. Detections are cached in cache_dir
+    (default: <image_folder>/.charuco_cache), so recalibrating with other flags or
+    after adding a few images only detects the new images.
+    With max_frames, only a subset of views chosen by select_frames is used in the solve;
+    compare_full also calibrates on every view and reports the difference.
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(image_folder, ".charuco_cache")
+
+    detections = detect_calibration_frames(image_folder, cache_dir, workers)
+    if len(detections) == 0:
+        print("❌ Nessuna immagine trovata nella cartella.")
+        return
+
+    all_corners = []
+    all_ids = []
+    image_size = None
+    messages = {
+        "invalid": "⚠️ Immagine non valida: {}",
+        "none": "❌ Nessun marker ArUco trovato in: {}",
+        "few": "❌ Board non sufficientemente visibile in: {}",
+        "ok": "✅ Rilevata board valida in: {}",
+    }
+    n_cached = 0
+    for filename, status, charuco_corners, charuco_ids, size, cached in detections:
+        n_cached += cached
+        print(messages[status].format(filename) + (" (cache)" if cached else ""))
+        if status != "ok":
+            continue
+        all_corners.append(charuco_corners)
+        all_ids.append(charuco_ids)
+        if image_size is None:
+            image_size = size
+    print(f"ℹ️ {n_cached}/{len(detections)} rilevamenti dalla cache")
+
+    if len(all_corners) < 5:
+        print("❌ Pochi frame validi per calibrazione.")
+        return
+
+    used_corners, used_ids = all_corners, all_ids
+    if max_frames is not None and len(all_corners) > max_frames:
+        chosen = select_frames(list(zip(all_corners, all_ids)), image_size, max_frames)
+        used_corners = [all_corners[k] for k in chosen]
+        used_ids = [all_ids[k] for k in chosen]
+        print(f"ℹ️ Selezionati {len(chosen)}/{len(all_corners)} frame (copertura, inclinazione, numero di corner)")
+
+    print("⚙️ Calibrazione in corso...")
+    start_t = time.time()
+    rms, camera_matrix, dist_coeffs = calibrate_from_detections(used_corners, used_ids, image_size, flags)
+    solve_t = time.time() - start_t
+
+    if compare_full and used_corners is not all_corners:
+        start_t = time.time()
+        rms_full, camera_matrix_full, dist_full = calibrate_from_detections(all_corners, all_ids, image_size, flags)
+        full_t = time.time() - start_t
+        rms_all = reprojection_rms(all_corners, all_ids, camera_matrix, dist_coeffs)
+        print(f"ℹ️ Sottoinsieme: rms={rms:.4f} px (su tutti i frame {rms_all:.4f} px), {solve_t:.2f} s")
+        print(f"ℹ️ Tutti i frame: rms={rms_full:.4f} px, {full_t:.2f} s → Δrms={rms_all - rms_full:+.4f} px")
+        d = [camera_matrix[0, 0] - camera_matrix_full[0, 0], camera_matrix[1, 1] - camera_matrix_full[1, 1],
+             camera_matrix[0, 2] - camera_matrix_full[0, 2], camera_matrix[1, 2] - camera_matrix_full[1, 2]]
+        print("ℹ️ Δ intrinseci (px): fx={:+.3f} fy={:+.3f} cx={:+.3f} cy={:+.3f}".format(*d))
+
+    # Estrazione dei parametri nel formato desiderato (k4..k6 = 0 without CALIB_RATIONAL_MODEL)
+    k = np.zeros(8)
+    coeffs = dist_coeffs.flatten()[:8]
+    k[:len(coeffs)] = coeffs
     calib_data = {
         "IntrinsicCalibration": {
             "OpenCV": {
@@ -84,6 +307,29 @@ def calibrate_from_images(image_folder, output_json_path):
         json.dump(calib_data, f, indent=4)
 
     print(f"✅ Calibrazione completata. Dati salvati in {output_json_path}")
+    return rms, camera_matrix, dist_coeffs
+
+
+def parse_flags(names):
+    """
+    ["RATIONAL_MODEL", "FIX_K3"] → cv2.CALIB_RATIONAL_MODEL | cv2.CALIB_FIX_K3
+    """
+    flags = 0
+    for name in names:
+        flags |= getattr(cv2, f"CALIB_{name.upper()}")
+    return flags
+
 
-# ESEMPIO USO:
-calibrate_from_images("../../data/calib_charuco", "calib_output.json")
\ No newline at end of file
+if __name__ == "__main__":
+    # ESEMPIO USO: python calibration.py ../../data/calib_charuco calib_output.json --flags RATIONAL_MODEL
+    parser = argparse.ArgumentParser(description="Intrinsic calibration from ChArUco images.")
+    parser.add_argument("image_folder", nargs="?", default="../../data/calib_charuco")
+    parser.add_argument("output_json", nargs="?", default="calib_output.json")
+    parser.add_argument("--flags", nargs="*", default=["RATIONAL_MODEL"], help="cv2.CALIB_* names, without prefix")
+    parser.add_argument("--cache-dir", help="detection cache (default: <image_folder>/.charuco_cache)")
+    parser.add_argument("--workers", type=int, default=0, help="detection processes (0 = all cores)")
+    parser.add_argument("--max-frames", type=int, help="solve on at most this many views, chosen for coverage")
+    parser.add_argument("--compare-full", action="store_true", help="also calibrate on every view and report the difference")
+    cli = parser.parse_args()
+    calibrate_from_images(cli.image_folder, cli.output_json, parse_flags(cli.flags), cli.cache_dir, cli.workers,
+                          cli.max_frames, cli.compare_full)
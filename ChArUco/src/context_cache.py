@@ -0,0 +1,96 @@
+import os
+import json
+import pickle
+import hashlib
+
+from utils import load_camera_calibration
+from detect_charuco import DETECTOR_PROFILES, DEFAULT_PROFILE, load_detector_profiles
+
+# Compiled run settings, next to the bytecode cache (never committed)
+CACHE_PATH = os.path.join(os.path.dirname(__file__), "__pycache__", "run_context.pkl")
+
+# Bump when the content of compile_run_settings changes
+CACHE_VERSION = 1
+
+
+def _resolve(path):
+    # same rule as load_camera_calibration / load_detector_profiles: relative to this directory
+    return path if os.path.isabs(path) else os.path.join(os.path.dirname(__file__), path)
+
+
+def file_hash(path):
+    with open(_resolve(path), "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+# Settings read by compile_run_settings: the others (input_dir, output_csv, ...) do not change the cache
+CACHED_SETTINGS = ("calib_file", "profiles_file", "detector_profile")
+
+
+def cache_key(args):
+    """
+    Identity of the compiled settings: the settings read by compile_run_settings, the content
+    hash of the files they point to (calibration YAML, detector profiles JSON) and the current
+    definition of the selected built-in profile, so that an edit of DETECTOR_PROFILES in
+    detect_charuco.py is never hidden by the cache. Hashing the raw bytes costs microseconds;
+    it is the parsing that the cache avoids.
+    """
+    settings = {key: getattr(args, key, None) for key in CACHED_SETTINGS}
+    files = {"calib_file": file_hash(args.calib_file)}
+    if getattr(args, "profiles_file", None):
+        files["profiles_file"] = file_hash(args.profiles_file)
+    builtin = DETECTOR_PROFILES.get(getattr(args, "detector_profile", DEFAULT_PROFILE))
+    parts = [settings, files, builtin]
+    return hashlib.sha1(f"{CACHE_VERSION}|{json.dumps(parts, sort_keys=True, default=str)}".encode()).hexdigest()
+
+
+def compile_run_settings(args):
+    """
+    The parts of a RunContext that need file parsing: intrinsics from the calibration YAML
+    and the resolved detector profile. OpenCV objects (boards, detectors) cannot be
+    serialized, they are rebuilt from these in about a millisecond.
+    """
+    camera_matrix, dist_coeffs = load_camera_calibration(args.calib_file)
+    if getattr(args, "profiles_file", None):
+        load_detector_profiles(args.profiles_file)
+    profile = getattr(args, "detector_profile", DEFAULT_PROFILE)
+    if profile not in DETECTOR_PROFILES:
+        raise ValueError(f"Unknown detector profile '{profile}' (available: {', '.join(DETECTOR_PROFILES)})")
+    return {
+        "camera_matrix": camera_matrix,
+        "dist_coeffs": dist_coeffs,
+        "profile": profile,
+        "profile_params": dict(DETECTOR_PROFILES[profile]),
+    }
+
+
+def load_run_settings(args, cache_path=CACHE_PATH):
+    """
+    compile_run_settings(args), from the cache when it was compiled from the same settings
+    and files, otherwise compiled and stored. The detector profile is registered in
+    DETECTOR_PROFILES as if its profiles file had been loaded.
+    """
+    key = cache_key(args)
+    compiled = None
+    try:
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+        if cached.get("key") == key:
+            compiled = cached["compiled"]
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, KeyError):
+        pass
+
+    if compiled is None:
+        compiled = compile_run_settings(args)
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            # write + rename, so that concurrent workers never read a half-written file
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump({"key": key, "compiled": compiled}, f)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass  # read-only install: just no cache
+
+    DETECTOR_PROFILES[compiled["profile"]] = compiled["profile_params"]
+    return compiled
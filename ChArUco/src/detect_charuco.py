@@ -1,17 +1,80 @@
 import cv2
+import json
+import os
 import numpy as np
 
+from timing import stage
+
 # We always use the same dictionary when printing the boards
 ARUCO_DICT = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_5X5_100)
 
-def create_charuco_boards(board_size, board_physical_size, marker_length_ratio):
+# Named parameter profiles for the marker detection ("detector_profile" in settings.json).
+# Keys are cv2.aruco.DetectorParameters attributes; cornerRefinementMethod is given by name.
+DETECTOR_PROFILES = {
+    # Nessun raffinamento e scansione delle soglie più grossolana: il più veloce
+    "fast": {
+        "cornerRefinementMethod": "none",
+        "adaptiveThreshWinSizeMin": 5,
+        "adaptiveThreshWinSizeMax": 25,
+        "adaptiveThreshWinSizeStep": 20,
+    },
+    # Parametri di default di OpenCV → output/set_*_charuco.csv
+    "charuco": {
+        "cornerRefinementMethod": "none",
+    },
+    # Raffinamento sub-pixel → output/set_*_charuco_sub.csv
+    "charuco_sub": {
+        # Metodo per il raffinamento dei corner:
+        # Attiva il raffinamento sub-pixel con cornerSubPix di OpenCV.
+        # Migliora la precisione della posizione dei corner dei marker.
+        "cornerRefinementMethod": "subpix",  # Default: CORNER_REFINE_NONE
+
+        # Numero massimo di iterazioni del processo di raffinamento:
+        # Più iterazioni permettono un affinamento più accurato, ma aumentano il tempo di elaborazione.
+        "cornerRefinementMaxIterations": 10000,  # Default: 30
+
+        # Accuratezza minima per terminare le iterazioni:
+        # L'algoritmo si ferma se il miglioramento è inferiore a questa soglia.
+        # Valori più bassi danno una precisione maggiore, ma aumentano il tempo di calcolo.
+        "cornerRefinementMinAccuracy": 0.001,  # Default: 0.1
+
+        # Dimensione della finestra di ricerca (in pixel) usata per cercare il massimo sub-pixel:
+        # La finestra reale sarà 2*WinSize + 1 (es: 7 → 15x15 pixel).
+        # Finestra più grande = più accuratezza, ma rischio di confusione se l'immagine è rumorosa.
+        "cornerRefinementWinSize": 15,  # Default: 5
+    },
+}
+DEFAULT_PROFILE = "charuco_sub"
+
+CORNER_REFINE_METHODS = {
+    "none": cv2.aruco.CORNER_REFINE_NONE,
+    "subpix": cv2.aruco.CORNER_REFINE_SUBPIX,
+    "contour": cv2.aruco.CORNER_REFINE_CONTOUR,
+    "apriltag": cv2.aruco.CORNER_REFINE_APRILTAG,
+}
+
+# Pose warm-start modes ("pose_warm_start" in settings.json):
+# "none" solves PnP from scratch, "guess" starts the iterative solver from the last pose,
+# "refine_lm" only runs a Levenberg-Marquardt refinement (solvePnPRefineLM) of the last pose.
+WARM_START_MODES = ("none", "guess", "refine_lm")
+
+# A warm-started pose is kept only if its reprojection RMS is at most WARM_START_RMS_RATIO times the
+# RMS of the last full solve of the board, and never above WARM_START_MAX_RMS_PX (a converged full
+# solve leaves ~0.02 px): otherwise it is discarded and the pose is solved from scratch.
+WARM_START_RMS_RATIO = 2.0
+WARM_START_MAX_RMS_PX = 0.15
+# Levenberg-Marquardt of the warm start, run to convergence (OpenCV default: 20 iterations, FLT_EPSILON)
+WARM_START_LM_CRITERIA = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_COUNT, 100, 1e-12)
+
+
+def create_charuco_board_set(n_boards, board_size, board_physical_size, marker_length_ratio):
     """
-    Create two non-overlapping CharucoBoards, with different IDs (ids1 and ids2)
-    similar to how you generated them:
+    Create n_boards non-overlapping CharucoBoards: board i uses the i-th block of
+    consecutive IDs (board 0 → 0..n_markers-1, board 1 → n_markers..2*n_markers-1, ...).
     - board_size: tuple (N, N), e.g. (3,3) or (5,5)
     - board_physical_size: side in meters of the entire printed board (here 0.075 m)
     - marker_length_ratio: ratio marker_length / square_length
-    Returns (board1, board2, square_length, marker_length).
+    Returns (boards, square_length, marker_length).
     """
     squares_x, squares_y = board_size
     # ---- Dynamic square_length calculation: whole board makes board_physical_size m
@@ -21,109 +84,452 @@ def create_charuco_boards(board_size, board_physical_size, marker_length_ratio):
 
     # numero di marker ArUco (floor(N*N/2))
     n_markers = (squares_x * squares_y) // 2
-    ids1 = np.arange(0, n_markers, dtype=int)
-    ids2 = np.arange(n_markers, 2 * n_markers, dtype=int)
-
-    board1 = cv2.aruco.CharucoBoard(
-        board_size,      # (squares_x, squares_y)
-        square_length,   # lato quadrato (metri)
-        marker_length,   # lato marker (metri)
-        ARUCO_DICT,      # il dizionario 5×5_100
-        ids1             # ID usati in board1
-    )
-    board2 = cv2.aruco.CharucoBoard(
-        board_size,
-        square_length,
-        marker_length,
-        ARUCO_DICT,
-        ids2
+    dict_size = len(ARUCO_DICT.bytesList)
+    if n_boards * n_markers > dict_size:
+        raise ValueError(f"{n_boards} board da {n_markers} marker non entrano nel dizionario ({dict_size} ID)")
+
+    boards = []
+    for i in range(n_boards):
+        boards.append(cv2.aruco.CharucoBoard(
+            board_size,      # (squares_x, squares_y)
+            square_length,   # lato quadrato (metri)
+            marker_length,   # lato marker (metri)
+            ARUCO_DICT,      # il dizionario 5×5_100
+            np.arange(i * n_markers, (i + 1) * n_markers, dtype=int)  # ID usati nella board i
+        ))
+    return boards, square_length, marker_length
+
+
+def create_charuco_boards(board_size, board_physical_size, marker_length_ratio):
+    """
+    The two boards C1/C2 of the plate: create_charuco_board_set with n_boards=2.
+    Returns (board1, board2, square_length, marker_length).
+    """
+    (board1, board2), square_length, marker_length = create_charuco_board_set(
+        2, board_size, board_physical_size, marker_length_ratio
     )
     return board1, board2, square_length, marker_length
 
-def detect_single_charuco(img_gray, board, camera_matrix, dist_coeffs):
+def load_detector_profiles(json_path):
     """
-    Attempts to detect a single CharucoBoard in img_gray.
-    Returns (rvec, tvec) if successful, otherwise None.
+    Adds the profiles stored in a JSON file ({name: {DetectorParameters field: value}})
+    to DETECTOR_PROFILES, e.g. the ones written by tune_refinement.py.
+    Returns the names of the loaded profiles.
+    """
+    # Se json_path è relativo, rendilo relativo al file corrente (__file__)
+    if not os.path.isabs(json_path):
+        json_path = os.path.join(os.path.dirname(__file__), json_path)
+    with open(json_path, "r") as f:
+        profiles = json.load(f)
+    for name, profile in profiles.items():
+        make_detector_parameters(profile)  # fail early on unknown fields
+        DETECTOR_PROFILES[name] = profile
+    return list(profiles)
+
+def make_detector_parameters(profile=DEFAULT_PROFILE):
     """
-    
-    # Crea un oggetto DetectorParameters per la rilevazione dei marker ArUco
+    Builds the DetectorParameters of a profile, given by name (key of DETECTOR_PROFILES)
+    or directly as a dict of DetectorParameters attributes.
+    """
+    if isinstance(profile, str):
+        if profile not in DETECTOR_PROFILES:
+            raise ValueError(f"Unknown detector profile '{profile}' (available: {', '.join(DETECTOR_PROFILES)})")
+        profile = DETECTOR_PROFILES[profile]
+
     par = cv2.aruco.DetectorParameters()
+    for key, value in profile.items():
+        if key == "cornerRefinementMethod" and isinstance(value, str):
+            value = CORNER_REFINE_METHODS[value]
+        if not hasattr(par, key):
+            raise ValueError(f"Unknown DetectorParameters field '{key}'")
+        setattr(par, key, value)
+    return par
 
-    # === Sub-pixel refinement settings ===
+class CharucoBoardDetector:
+    """
+    Long-lived detector of one CharucoBoard, wrapping cv2.aruco.CharucoDetector.
+    Build it once and reuse it on every frame. It keeps the last pose of the board,
+    used as starting point of the next solve when warm_start is not "none".
+    With undistort_model (a utils.CameraModel) the ChArUco corners are undistorted once
+    and the pose is solved with a zero-distortion model.
+    """
+    def __init__(self, board, name, camera_matrix, dist_coeffs, warm_start="none", undistort_model=None):
+        if warm_start not in WARM_START_MODES:
+            raise ValueError(f"Unknown pose warm-start mode '{warm_start}' (available: {', '.join(WARM_START_MODES)})")
+        self.board = board
+        self.name = name
+        self.warm_start = warm_start
+        self.last_pose = None
+        # reprojection RMS of the last full solve, reference of the warm-start guard
+        self.full_rms = None
+        self.ids = board.getIds().flatten()
+        self.camera_matrix = camera_matrix
+        self.dist_coeffs = dist_coeffs
+        self.undistort_model = undistort_model
+        # distortion seen by the pose solver
+        self.pose_dist_coeffs = dist_coeffs if undistort_model is None else undistort_model.zero_dist_coeffs
 
-    # Metodo per il raffinamento dei corner:
-    # Attiva il raffinamento sub-pixel con cornerSubPix di OpenCV.
-    # Migliora la precisione della posizione dei corner dei marker.
-    par.cornerRefinementMethod = cv2.aruco.CORNER_REFINE_SUBPIX  # Default: CORNER_REFINE_NONE
+        charuco_par = cv2.aruco.CharucoParameters()
+        charuco_par.cameraMatrix = camera_matrix
+        charuco_par.distCoeffs = dist_coeffs
+        # Markers always come from the shared detection pass, so the DetectorParameters of
+        # CharucoDetector only drive the cornerSubPix of the ChArUco corners: keep the OpenCV
+        # defaults, as the legacy interpolateCornersCharuco did (same output as before).
+        self.detector = cv2.aruco.CharucoDetector(board, charuco_par, cv2.aruco.DetectorParameters())
 
-    # Numero massimo di iterazioni del processo di raffinamento:
-    # Più iterazioni permettono un affinamento più accurato, ma aumentano il tempo di elaborazione.
-    par.cornerRefinementMaxIterations = 10000  # Default: 30
+    def select_markers(self, corners, ids):
+        """
+        Keeps only the markers whose ID belongs to this board (the boards use disjoint ID ranges).
+        Returns (corners, ids) of this board, ids is None if the board has no marker.
+        """
+        if ids is None:
+            return [], None
+        keep = np.flatnonzero(np.isin(ids.flatten(), self.ids))
+        if len(keep) == 0:
+            return [], None
+        return [corners[i] for i in keep], ids[keep]
 
-    # Accuratezza minima per terminare le iterazioni:
-    # L'algoritmo si ferma se il miglioramento è inferiore a questa soglia.
-    # Valori più bassi danno una precisione maggiore, ma aumentano il tempo di calcolo.
-    par.cornerRefinementMinAccuracy = 0.001  # Default: 0.1
+    def interpolate_corners(self, img_gray, corners, ids):
+        """
+        ChArUco corners of the board from its already detected markers.
+        Returns (charuco_corners, charuco_ids), or None if fewer than 4 corners are found.
+        """
+        if ids is None or len(ids) == 0:
+            return None
+        charuco_corners, charuco_ids, _, _ = self.detector.detectBoard(
+            img_gray, markerCorners=corners, markerIds=ids
+        )
+        if charuco_corners is None or charuco_ids is None or len(charuco_ids) < 4:
+            # min 4 corners to solvePnP to be robust
+            return None
+        return charuco_corners, charuco_ids
 
-    # Dimensione della finestra di ricerca (in pixel) usata per cercare il massimo sub-pixel:
-    # La finestra reale sarà 2*WinSize + 1 (es: 7 → 15x15 pixel).
-    # Finestra più grande = più accuratezza, ma rischio di confusione se l'immagine è rumorosa.
-    par.cornerRefinementWinSize = 15  # Default: 5
+    def estimate_pose(self, charuco_corners, charuco_ids):
+        """
+        Pose of the board from its ChArUco corners (same solver as estimatePoseCharucoBoard).
+        Returns (rvec, tvec) if successful, otherwise None.
+        """
+        obj_points, img_points = self.board.matchImagePoints(charuco_corners, charuco_ids)
+        if obj_points is None or len(obj_points) < 4:
+            return None
+        # collinear corners (e.g. a single row of a 5x5 board) give no reliable pose
+        obj_points = obj_points.reshape(-1, 3)
+        if np.linalg.matrix_rank(obj_points - obj_points.mean(axis=0), tol=1e-9) < 2:
+            return None
 
-    # 1. detect ArUco markers:
-    corners, ids, _ = cv2.aruco.detectMarkers(
-        img_gray, ARUCO_DICT, parameters= par
-    )
-    if ids is None or len(ids) == 0:
-        return None
-    # 2. find Charuco corners:
-    
-    _, charuco_corners, charuco_ids = cv2.aruco.interpolateCornersCharuco(
-        markerCorners=corners,
-        markerIds=ids,
-        image=img_gray,
-        board=board,
-        cameraMatrix=camera_matrix,
-        distCoeffs=dist_coeffs
-    )
-    if charuco_corners is None or charuco_ids is None or len(charuco_ids) < 4:
-        # min 4 corners to solvePnP to be robust
-        return None
-
-    #3. estimate the pose of the CharucoBoard 
-    success, rvec, tvec = cv2.aruco.estimatePoseCharucoBoard(
-        charucoCorners=charuco_corners,
-        charucoIds=charuco_ids,
-        board=board,
-        cameraMatrix=camera_matrix,
-        distCoeffs=dist_coeffs,
-        rvec=None,
-        tvec=None
-    )
-    if not success:
-        return None
-    return rvec.flatten(), tvec.flatten()
+        if self.undistort_model is not None:
+            img_points = self.undistort_model.undistort_points(img_points)
+        img_points = img_points.reshape(-1, 2)
+        pose = None
+        if self.warm_start != "none" and self.last_pose is not None and self.full_rms is not None:
+            pose = self._solve_warm(obj_points, img_points)
+        if pose is None:
+            success, rvec, tvec = cv2.solvePnP(
+                obj_points, img_points, self.camera_matrix, self.pose_dist_coeffs
+            )
+            if not success:
+                self.last_pose = None
+                return None
+            if self.warm_start != "none":
+                self.full_rms = self._reprojection_rms(obj_points, img_points, rvec, tvec)
+            pose = rvec.flatten(), tvec.flatten()
+        self.last_pose = pose
+        return pose
+
+    def _reprojection_rms(self, obj_points, img_points, rvec, tvec):
+        projected, _ = cv2.projectPoints(obj_points, rvec, tvec, self.camera_matrix, self.pose_dist_coeffs)
+        return np.sqrt(np.mean(np.sum((projected.reshape(-1, 2) - img_points) ** 2, axis=1)))
+
+    def _solve_warm(self, obj_points, img_points):
+        """
+        PnP started from the last pose of the board, refined by LM to convergence. Returns None
+        if its RMS is not close to the one of the last full solve (WARM_START_RMS_RATIO,
+        WARM_START_MAX_RMS_PX), so that the caller falls back to the full solve.
+        """
+        rvec = self.last_pose[0].reshape(3, 1).copy()
+        tvec = self.last_pose[1].reshape(3, 1).copy()
+        if self.warm_start == "guess":
+            success, rvec, tvec = cv2.solvePnP(
+                obj_points, img_points, self.camera_matrix, self.pose_dist_coeffs,
+                rvec=rvec, tvec=tvec, useExtrinsicGuess=True
+            )
+            if not success:
+                return None
+        rvec, tvec = cv2.solvePnPRefineLM(
+            obj_points, img_points, self.camera_matrix, self.pose_dist_coeffs, rvec, tvec,
+            criteria=WARM_START_LM_CRITERIA
+        )
+
+        if not (np.all(np.isfinite(rvec)) and np.all(np.isfinite(tvec))) or tvec[2, 0] <= 0:
+            return None
+        rms = self._reprojection_rms(obj_points, img_points, rvec, tvec)
+        if rms > min(WARM_START_RMS_RATIO * self.full_rms, WARM_START_MAX_RMS_PX):
+            return None
+        return rvec.flatten(), tvec.flatten()
+
+    def detect(self, img_gray, corners, ids, timer=None):
+        """
+        Interpolation + pose of the board from the markers of the shared detection pass.
+        Returns (rvec, tvec) if successful, otherwise None.
+        timer is an optional timing.StageTimer ("interpolate" and "pose" stages).
+        """
+        with stage(timer, "interpolate"):
+            found = self.interpolate_corners(img_gray, corners, ids)
+        if found is None:
+            # board lost: the next frame starts again from scratch
+            self.last_pose = None
+            return None
+        with stage(timer, "pose"):
+            return self.estimate_pose(*found)
 
-def detect_two_charuco(img_bgr, board1, board2, camera_matrix, dist_coeffs):
+class CharucoEngine:
     """
-    Given a BGR image, try to detect board1 first then board2.
-    Returns:
-    results = [
-    (marker_id, rvec, tvec), # e.g. ("C1", rvec1, tvec1)
-    (marker_id, rvec, tvec) # e.g. ("C2", rvec2, tvec2)
-    ]
-    If either is NOT found, it does NOT appear in the list.
+    Detection engine for a set of boards: one ArucoDetector shared by all boards
+    (single marker pass per frame) and one CharucoBoardDetector per board.
+    Built once per process from a named profile, then reused on every frame.
+    With pyramid_scale < 1 the markers are searched on a downscaled image and their
+    corners refined with cornerSubPix in small windows of the full-resolution image.
+    warm_start (see WARM_START_MODES) reuses the pose of the previous frame in the PnP solve.
+    undistort_model (utils.CameraModel) enables the pose solve on pre-undistorted corners.
     """
-    img_gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
+    def __init__(self, boards, camera_matrix, dist_coeffs, profile=DEFAULT_PROFILE, names=None,
+                 pyramid_scale=1.0, warm_start="none", undistort_model=None):
+        if names is None:
+            names = [f"C{i + 1}" for i in range(len(boards))]
+        if not 0.0 < pyramid_scale <= 1.0:
+            raise ValueError(f"pyramid_scale must be in (0, 1], got {pyramid_scale}")
+        self.profile = profile
+        self.pyramid_scale = pyramid_scale
+        self.detector_parameters = make_detector_parameters(profile)
+        self.marker_detector = cv2.aruco.ArucoDetector(ARUCO_DICT, self.detector_parameters)
+        self.board_detectors = [
+            CharucoBoardDetector(board, name, camera_matrix, dist_coeffs, warm_start, undistort_model)
+            for board, name in zip(boards, names)
+        ]
+        # marker ID → index of its board (-1: not on any board), to split a detection pass in one step
+        self.board_of_id = np.full(len(ARUCO_DICT.bytesList), -1, dtype=np.int32)
+        for i, det in enumerate(self.board_detectors):
+            if np.any(self.board_of_id[det.ids] >= 0):
+                raise ValueError(f"La board {det.name} condivide ID con un'altra board")
+            self.board_of_id[det.ids] = i
+
+        if pyramid_scale < 1.0:
+            # coarse level: same profile, refinement moved to the full-resolution image
+            coarse_par = make_detector_parameters(profile)
+            coarse_par.cornerRefinementMethod = cv2.aruco.CORNER_REFINE_NONE
+            self.coarse_detector = cv2.aruco.ArucoDetector(ARUCO_DICT, coarse_par)
+
+            par = self.detector_parameters
+            if par.cornerRefinementMethod == cv2.aruco.CORNER_REFINE_SUBPIX:
+                self.refine_win_size = par.cornerRefinementWinSize
+            else:
+                # the window only has to absorb the upscaling error of the coarse corners
+                self.refine_win_size = max(3, int(np.ceil(2.0 / pyramid_scale)))
+            # as in ArucoDetector, the window is also capped to a fraction of the marker
+            # module size, so that it never reaches the surrounding chessboard squares
+            self.relative_win_size = par.relativeCornerRefinmentWinSize
+            self.marker_modules = ARUCO_DICT.markerSize + 2 * par.markerBorderBits
+            self.refine_criteria = (
+                cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_COUNT,
+                par.cornerRefinementMaxIterations,
+                par.cornerRefinementMinAccuracy,
+            )
+
+    def split_markers(self, corners, ids):
+        """
+        Splits the markers of one detection pass between the boards through the ID lookup
+        table (a single pass over the markers, whatever the number of boards).
+        Returns one (corners, ids) per board, as CharucoBoardDetector.select_markers.
+        """
+        n_boards = len(self.board_detectors)
+        if ids is None:
+            return [([], None)] * n_boards
+        board = self.board_of_id[ids.ravel()]
+        # stable sort: inside a board the markers keep the detector order
+        order = np.argsort(board, kind="stable")
+        bounds = np.searchsorted(board[order], np.arange(n_boards + 1))
+        groups = []
+        for i in range(n_boards):
+            keep = order[bounds[i]:bounds[i + 1]]
+            groups.append(([corners[k] for k in keep], ids[keep]) if len(keep) else ([], None))
+        return groups
+
+    def _detect_pyramid(self, img_gray):
+        s = self.pyramid_scale
+        small = cv2.resize(img_gray, None, fx=s, fy=s, interpolation=cv2.INTER_AREA)
+        corners, ids, _ = self.coarse_detector.detectMarkers(small)
+        if ids is None or len(ids) == 0:
+            return corners, ids
+
+        # back to full-resolution pixels (pixel centres, not pixel edges, are aligned)
+        pts = ((np.concatenate(corners).reshape(-1, 4, 2) + 0.5) / s - 0.5).astype(np.float32)
+
+        # refinement window of each marker, from its average side in full-resolution pixels
+        sides = np.linalg.norm(pts - np.roll(pts, 1, axis=1), axis=2).mean(axis=1)
+        win_sizes = np.maximum(
+            np.minimum(self.refine_win_size, (sides / self.marker_modules * self.relative_win_size).astype(int)), 2
+        )
+        # one cornerSubPix call per window size (usually a single one)
+        for win in np.unique(win_sizes):
+            group = np.flatnonzero(win_sizes == win)
+            group_pts = np.ascontiguousarray(pts[group].reshape(-1, 1, 2))
+            cv2.cornerSubPix(img_gray, group_pts, (int(win), int(win)), (-1, -1), self.refine_criteria)
+            pts[group] = group_pts.reshape(-1, 4, 2)
+        return list(pts.reshape(-1, 1, 4, 2)), ids
+
+    def _detect_region(self, img_gray):
+        if self.pyramid_scale < 1.0:
+            return self._detect_pyramid(img_gray)
+        corners, ids, _ = self.marker_detector.detectMarkers(img_gray)
+        return corners, ids
+
+    def detect_markers(self, img_gray, rois=None):
+        """
+        Runs the ArUco marker detection once on the whole image, or only inside
+        rois = [(x0, y0, x1, y1), ...] (corners are returned in full-image pixels).
+        Returns (corners, ids); ids is None when nothing is found.
+        """
+        if rois is None:
+            corners, ids = self._detect_region(img_gray)
+            if ids is None or len(ids) == 0:
+                return corners, None
+            return corners, ids
+
+        all_corners, all_ids, seen = [], [], set()
+        for x0, y0, x1, y1 in rois:
+            corners, ids = self._detect_region(img_gray[y0:y1, x0:x1])
+            if ids is None:
+                continue
+            offset = np.array([x0, y0], dtype=np.float32)
+            for c, marker_id in zip(corners, ids.flatten()):
+                # overlapping ROIs may see the same marker twice
+                if marker_id in seen:
+                    continue
+                seen.add(marker_id)
+                all_corners.append(c + offset)
+                all_ids.append(marker_id)
+        if not all_ids:
+            return [], None
+        return all_corners, np.array(all_ids, dtype=np.int32).reshape(-1, 1)
+
+class BoardTracker:
+    """
+    ROI tracking for static or slowly moving rigs: projects the last pose of each
+    board through the camera model and returns a padded bounding box per board,
+    so that the marker detection of the next frame only runs on those crops.
+    Tracking is lost (and the next frame searched in full) as soon as a board is missing.
+    """
+    def __init__(self, engine, camera_matrix, dist_coeffs, padding=0.25, min_padding_px=32):
+        self.camera_matrix = camera_matrix
+        self.dist_coeffs = dist_coeffs
+        self.padding = padding
+        self.min_padding_px = min_padding_px
+        self.outlines = []
+        for det in engine.board_detectors:
+            # outer corners of the board in its own frame (metres)
+            squares_x, squares_y = det.board.getChessboardSize()
+            w = squares_x * det.board.getSquareLength()
+            h = squares_y * det.board.getSquareLength()
+            self.outlines.append(np.array([[0, 0, 0], [w, 0, 0], [w, h, 0], [0, h, 0]], dtype=np.float64))
+        self.names = [det.name for det in engine.board_detectors]
+        self.last_poses = [None] * len(self.outlines)
+
+    def reset(self):
+        self.last_poses = [None] * len(self.outlines)
+
+    def predict_rois(self, image_shape):
+        """
+        Returns one (x0, y0, x1, y1) crop per board, or None when tracking is lost.
+        """
+        if any(pose is None for pose in self.last_poses):
+            return None
+        height, width = image_shape[:2]
+        rois = []
+        for outline, (rvec, tvec) in zip(self.outlines, self.last_poses):
+            pts, _ = cv2.projectPoints(outline, rvec, tvec, self.camera_matrix, self.dist_coeffs)
+            pts = pts.reshape(-1, 2)
+            (x_min, y_min), (x_max, y_max) = pts.min(axis=0), pts.max(axis=0)
+            pad = max(self.padding * max(x_max - x_min, y_max - y_min), self.min_padding_px)
+            x0, y0 = max(int(x_min - pad), 0), max(int(y_min - pad), 0)
+            x1, y1 = min(int(np.ceil(x_max + pad)), width), min(int(np.ceil(y_max + pad)), height)
+            if x1 <= x0 or y1 <= y0:
+                # board predicted outside the image
+                return None
+            rois.append((x0, y0, x1, y1))
+        return rois
+
+    def update(self, results):
+        """
+        Stores the poses of the frame just processed (results of detect_two_charuco).
+        """
+        poses = {name: (rvec, tvec) for name, rvec, tvec in results}
+        self.last_poses = [poses.get(name) for name in self.names]
+
+def to_gray(img):
+    """
+    Returns the single-channel version of img (no copy if it is already gray).
+    """
+    if img.ndim == 3:
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return img
+
+def detect_single_charuco(img_gray, engine, index=0):
+    """
+    Attempts to detect a single CharucoBoard (engine.board_detectors[index]) in img_gray.
+    Returns (rvec, tvec) if successful, otherwise None.
+    """
+    board_detector = engine.board_detectors[index]
+    # 1. detect ArUco markers:
+    corners, ids = engine.detect_markers(img_gray)
+    corners, ids = board_detector.select_markers(corners, ids)
+    return board_detector.detect(img_gray, corners, ids)
+
+def _detect_boards_pass(img_gray, engine, require_all, rois, timer):
+    # 1. single marker detection pass, shared by all the boards
+    with stage(timer, "detect"):
+        corners, ids = engine.detect_markers(img_gray, rois)
+    groups = engine.split_markers(corners, ids)
+    if require_all and any(board_ids is None for _, board_ids in groups):
+        return []
+
+    # 2. interpolation + pose of each board ("C1", "C2", ... in board order)
     results = []
-    out1 = detect_single_charuco(img_gray, board1, camera_matrix, dist_coeffs)
-    if out1 is not None:
-        # Let's assign “C1” to the first board:
-        rvec1, tvec1 = out1
-        results.append(("C1", rvec1, tvec1))
-    out2 = detect_single_charuco(img_gray, board2, camera_matrix, dist_coeffs)
-    if out2 is not None:
-        # Let's assign “C2” to the second board:
-        rvec2, tvec2 = out2
-        results.append(("C2", rvec2, tvec2))
+    for det, (board_corners, board_ids) in zip(engine.board_detectors, groups):
+        out = det.detect(img_gray, board_corners, board_ids, timer)
+        if out is not None:
+            rvec, tvec = out
+            results.append((det.name, rvec, tvec))
+        elif require_all:
+            return []
     return results
+
+def detect_charuco_boards(img_bgr, engine, require_all=False, tracker=None, timer=None):
+    """
+    Given a BGR (or gray) image, detect the markers once and split them between all the
+    boards of engine through the ID lookup table, then interpolate and estimate the pose of each board.
+    Returns results = [(name, rvec, tvec), ...] in board order (e.g. "C1", "C2", ...);
+    a board that is NOT found does NOT appear in the list.
+    With require_all=True the function returns [] as soon as one board is missing
+    (no marker of its ID range, or no pose), skipping the work on the others.
+    With a BoardTracker the markers are searched only in the ROIs predicted from the
+    previous frame; if a board is lost there, the frame is searched again in full.
+    With a timing.StageTimer the time of each stage (detect, interpolate, pose) is accumulated in it.
+    """
+    img_gray = to_gray(img_bgr)
+    if tracker is None:
+        return _detect_boards_pass(img_gray, engine, require_all, None, timer)
+
+    rois = tracker.predict_rois(img_gray.shape)
+    results = _detect_boards_pass(img_gray, engine, require_all, rois, timer)
+    if rois is not None and len(results) != len(engine.board_detectors):
+        # tracking lost → full-frame search
+        results = _detect_boards_pass(img_gray, engine, require_all, None, timer)
+    tracker.update(results)
+    return results
+
+def detect_two_charuco(img_bgr, engine, require_both=False, tracker=None, timer=None):
+    """
+    detect_charuco_boards on the two boards C1/C2 of engine:
+    results = [("C1", rvec1, tvec1), ("C2", rvec2, tvec2)], without the boards not found.
+    """
+    return detect_charuco_boards(img_bgr, engine, require_both, tracker, timer)
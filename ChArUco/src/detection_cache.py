@@ -0,0 +1,181 @@
+import os
+import cv2
+import json
+import hashlib
+import numpy as np
+
+from detect_charuco import ARUCO_DICT
+from timing import stage
+
+# Bump when the content of the cache entries changes
+CACHE_VERSION = 1
+
+
+def _sha1(*parts):
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode())
+    return h.hexdigest()
+
+
+def marker_namespace(profile_params, pyramid_scale, undistort, camera_matrix, dist_coeffs):
+    """
+    Everything the marker corners depend on besides the image: detector profile, pyramid level,
+    OpenCV version and, with undistort="image", the calibration used to undistort the image.
+    """
+    calib = (camera_matrix.tobytes() + dist_coeffs.tobytes()) if undistort == "image" else b""
+    return _sha1(CACHE_VERSION, json.dumps(profile_params, sort_keys=True), pyramid_scale, undistort,
+                 cv2.__version__, ARUCO_DICT.markerSize, ARUCO_DICT.bytesList.tobytes(), calib)
+
+
+def board_geometry_key(boards, camera_matrix, dist_coeffs):
+    """
+    Everything the ChArUco corners depend on besides the markers: board geometry (so a new
+    marker_length_ratio recomputes them) and the intrinsics used by the interpolation.
+    """
+    parts = [camera_matrix.tobytes(), dist_coeffs.tobytes()]
+    for board in boards:
+        parts += [board.getChessboardSize(), board.getSquareLength(), board.getMarkerLength(), board.getIds().tobytes()]
+    return "g" + _sha1(*parts)[:16]
+
+
+class DetectionCache:
+    """
+    On-disk cache of the detection output of each image, content-addressed: one .npz per
+    sha1(namespace + image file bytes), holding the marker corners/ids and the ChArUco
+    corners/ids of every board geometry seen so far. Entries are evicted least recently
+    used first when the cache grows past max_mb.
+    """
+    def __init__(self, cache_dir, max_mb=512, namespace=""):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.namespace = namespace
+        os.makedirs(cache_dir, exist_ok=True)
+        self.size = sum(e.stat().st_size for e in os.scandir(cache_dir) if e.name.endswith(".npz"))
+
+    def key(self, img_bytes):
+        return _sha1(self.namespace, img_bytes)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key):
+        """
+        The entry as a dict of arrays, or None. A hit refreshes the entry for the LRU eviction.
+        """
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                entry = {name: data[name] for name in data.files}
+            os.utime(path)
+        except (OSError, ValueError):
+            return None  # missing, or evicted/being replaced by another process
+        return entry
+
+    def put(self, key, entry):
+        path = self._path(key)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        # write + rename, so that readers (pool workers) never see a half-written entry
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, **entry)
+        os.replace(tmp_path, path)
+        self.size += os.path.getsize(path) - old_size
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        Deletes the least recently used entries until the cache is below 90% of max_bytes.
+        """
+        entries = sorted(
+            (e.stat().st_mtime, e.stat().st_size, e.path) for e in os.scandir(self.cache_dir) if e.name.endswith(".npz")
+        )
+        self.size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self.size <= 0.9 * self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.size -= size
+
+
+def _pack_markers(corners, ids):
+    if ids is None:
+        return np.zeros((0, 4, 2), np.float32), np.zeros((0, 1), np.int32)
+    return np.array(corners, dtype=np.float32).reshape(-1, 4, 2), np.asarray(ids, dtype=np.int32).reshape(-1, 1)
+
+
+def _unpack_markers(corners, ids):
+    if len(ids) == 0:
+        return [], None
+    return list(corners.reshape(-1, 1, 4, 2)), ids
+
+
+def detect_charuco_boards_cached(img_bytes, load_image, engine, cache, geometry_key, timer=None):
+    """
+    detect_charuco_boards(require_all=True) backed by the DetectionCache: marker detection and
+    ChArUco interpolation run only for what the entry of this image does not hold yet, and the
+    image is decoded (load_image()) only then. The pose is always solved, from the cached corners.
+    Returns the same list of (name, rvec, tvec).
+    """
+    key = cache.key(img_bytes)
+    entry = cache.get(key) or {}
+    changed = False
+    img = None
+
+    def image():
+        nonlocal img
+        if img is None:
+            with stage(timer, "read"):
+                img = load_image()
+        return img
+
+    if "marker_ids" in entry:
+        corners, ids = _unpack_markers(entry["marker_corners"], entry["marker_ids"])
+    else:
+        img_gray = image()
+        with stage(timer, "detect"):
+            corners, ids = engine.detect_markers(img_gray)
+        entry["marker_corners"], entry["marker_ids"] = _pack_markers(corners, ids)
+        changed = True
+
+    found = []
+    groups = None
+    for i, det in enumerate(engine.board_detectors):
+        prefix = f"{geometry_key}_{det.name}"
+        if f"{prefix}_ids" in entry:
+            charuco = entry[f"{prefix}_corners"], entry[f"{prefix}_ids"]
+            charuco = charuco if len(charuco[1]) else None
+        else:
+            if groups is None:
+                groups = engine.split_markers(corners, ids)
+            board_corners, board_ids = groups[i]
+            charuco = None
+            if board_ids is not None:
+                img_gray = image()
+                with stage(timer, "interpolate"):
+                    charuco = det.interpolate_corners(img_gray, board_corners, board_ids)
+            entry[f"{prefix}_corners"], entry[f"{prefix}_ids"] = charuco if charuco is not None else (
+                np.zeros((0, 1, 2), np.float32), np.zeros((0, 1), np.int32))
+            changed = True
+        found.append((det, charuco))
+        if charuco is None:
+            break  # require_all: the other boards are not needed
+
+    if changed:
+        cache.put(key, entry)
+
+    results = []
+    for det, charuco in found:
+        if charuco is None:
+            # board lost: the next frame starts again from scratch
+            det.last_pose = None
+            return []
+        with stage(timer, "pose"):
+            out = det.estimate_pose(*charuco)
+        if out is None:
+            return []
+        results.append((det.name, *out))
+    return results
@@ -0,0 +1,55 @@
+import cv2
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def read_gray(img_path):
+    """
+    Decodes an image straight to a single-channel uint8 array (our Basler TIFFs are mono,
+    so there is no BGR copy to convert back). Raises IOError if it cannot be read.
+    """
+    img_gray = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
+    if img_gray is None:
+        raise IOError(f"Impossibile leggere {img_path}")
+    return img_gray
+
+
+def _load(img_path):
+    try:
+        return read_gray(img_path), None
+    except Exception as e:
+        return None, e
+
+
+class FrameLoader:
+    """
+    Iterates over img_paths in order, yielding (img_path, img_gray, error).
+    The next `prefetch` images are read and decoded on a background thread pool
+    (cv2.imread releases the GIL), so disk and decode time overlap with detection.
+    At most `prefetch` decoded frames are held in memory at any time.
+    """
+    def __init__(self, img_paths, prefetch=4, threads=2):
+        self.img_paths = img_paths
+        self.prefetch = max(int(prefetch), 0)
+        self.threads = max(int(threads), 1)
+
+    def __iter__(self):
+        if self.prefetch == 0:
+            for img_path in self.img_paths:
+                yield (img_path, *_load(img_path))
+            return
+
+        paths = iter(self.img_paths)
+        with ThreadPoolExecutor(self.threads) as executor:
+            queue = deque()
+            # bounded queue: never more than `prefetch` frames in flight
+            for img_path in paths:
+                queue.append((img_path, executor.submit(_load, img_path)))
+                if len(queue) == self.prefetch:
+                    break
+            while queue:
+                img_path, future = queue.popleft()
+                next_path = next(paths, None)
+                if next_path is not None:
+                    queue.append((next_path, executor.submit(_load, next_path)))
+                yield (img_path, *future.result())
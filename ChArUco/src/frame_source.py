@@ -0,0 +1,228 @@
+import os
+import cv2
+import glob
+import time
+import queue
+import threading
+
+from frame_loader import read_gray
+
+# What the producer does when the frame queue is full:
+# "block"       → waits for the consumer (backpressure, no frame lost)
+# "drop_oldest" → discards the oldest queued frame, so detection always works on the newest ones
+QUEUE_POLICIES = ("block", "drop_oldest")
+
+# Kinds of frame source ("source" in settings.json)
+SOURCE_KINDS = ("directory", "watch", "video")
+
+
+class Frame:
+    """
+    One frame of a stream: name (used as image_name), gray image (None if it could not be
+    read, with the exception in error) and t_capture, the time.time() it became available.
+    """
+    __slots__ = ("name", "image", "error", "t_capture")
+
+    def __init__(self, name, image, error=None, t_capture=None):
+        self.name = name
+        self.image = image
+        self.error = error
+        self.t_capture = time.time() if t_capture is None else t_capture
+
+
+class DirectoryWatchSource:
+    """
+    Frames from a directory that is still being written: every poll_interval the new files are
+    yielded in name order, once they have not been modified for settle_time seconds (the writer
+    has finished). Stops after idle_timeout seconds without new files (None → never).
+    """
+    def __init__(self, input_dir, pattern="*.*", poll_interval=0.2, settle_time=0.5, idle_timeout=None):
+        self.input_dir = input_dir
+        self.pattern = pattern
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.idle_timeout = idle_timeout
+
+    def __iter__(self):
+        seen = set()
+        last_new = time.time()
+        while True:
+            now = time.time()
+            ready = []
+            for path in sorted(glob.glob(os.path.join(self.input_dir, self.pattern))):
+                if path in seen:
+                    continue
+                try:
+                    if now - os.path.getmtime(path) < self.settle_time:
+                        continue
+                except OSError:
+                    continue  # removed in the meantime
+                ready.append(path)
+            for path in ready:
+                seen.add(path)
+                # the file is complete now: the latency also covers its decode
+                t_capture = time.time()
+                try:
+                    yield Frame(os.path.basename(path), read_gray(path), t_capture=t_capture)
+                except Exception as e:
+                    yield Frame(os.path.basename(path), None, e, t_capture)
+            if ready:
+                last_new = time.time()
+            elif self.idle_timeout is not None and time.time() - last_new > self.idle_timeout:
+                return
+            else:
+                time.sleep(self.poll_interval)
+
+
+class VideoSource:
+    """
+    Frames of a video file, or of a capture device when path is a camera index (e.g. "0").
+    Frames are named frame_<n>.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def __iter__(self):
+        cap = cv2.VideoCapture(int(self.path) if str(self.path).isdigit() else self.path)
+        if not cap.isOpened():
+            raise IOError(f"Impossibile aprire {self.path}")
+        try:
+            n = 0
+            while True:
+                ok, img = cap.read()
+                if not ok:
+                    return
+                if img.ndim == 3:
+                    img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+                yield Frame(f"frame_{n:06d}", img)
+                n += 1
+        finally:
+            cap.release()
+
+
+class GeneratorSource:
+    """
+    Wraps an in-process iterable standing in for the camera. Items are gray (or BGR) images,
+    or (name, image) pairs.
+    """
+    def __init__(self, frames):
+        self.frames = frames
+
+    def __iter__(self):
+        for n, item in enumerate(self.frames):
+            name, img = item if isinstance(item, tuple) else (f"frame_{n:06d}", item)
+            if img.ndim == 3:
+                img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            yield Frame(name, img)
+
+
+def open_frame_source(args):
+    """
+    Frame source of a stream run from settings.json: "source": "watch" (input_dir still being
+    written, "watch_idle_timeout" s without new files ends the run) or "video" ("video_source":
+    file path or camera index).
+    """
+    kind = getattr(args, "source", "directory")
+    if kind == "watch":
+        return DirectoryWatchSource(
+            args.input_dir,
+            poll_interval=getattr(args, "watch_poll_interval", 0.2),
+            idle_timeout=getattr(args, "watch_idle_timeout", None)
+        )
+    if kind == "video":
+        return VideoSource(args.video_source)
+    raise ValueError(f"Unknown frame source '{kind}' (available: {', '.join(SOURCE_KINDS)})")
+
+
+_END = object()
+
+
+class FramePipeline:
+    """
+    Producer/consumer stages connected by bounded queues:
+    source thread → frame queue → process thread → result queue → caller.
+    The frame queue holds at most queue_size frames and applies the policy (QUEUE_POLICIES)
+    when detection falls behind; the result queue always blocks, so a slow writer slows
+    detection down instead of piling up results. Iterating yields (frame, process(frame))
+    in capture order; dropped counts the discarded frames.
+    """
+    def __init__(self, source, process, queue_size=8, policy="block"):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy '{policy}' (available: {', '.join(QUEUE_POLICIES)})")
+        self.source = source
+        self.process = process
+        self.policy = policy
+        self.frames = queue.Queue(max(int(queue_size), 1))
+        self.results = queue.Queue(max(int(queue_size), 1))
+        self.dropped = 0
+        self._stop = threading.Event()
+        self._error = None
+
+    def _put_frame(self, item):
+        if self.policy == "block" or item is _END:
+            while not self._stop.is_set():
+                try:
+                    self.frames.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+            return
+        while True:
+            try:
+                self.frames.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.frames.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _produce(self):
+        try:
+            for frame in self.source:
+                if self._stop.is_set():
+                    break
+                self._put_frame(frame)
+        except Exception as e:
+            self._error = e
+        finally:
+            self._put_frame(_END)
+
+    def _consume(self):
+        try:
+            while True:
+                frame = self.frames.get()
+                if frame is _END or self._stop.is_set():
+                    break
+                self.results.put((frame, self.process(frame)))
+        except Exception as e:
+            self._error = e
+            self._stop.set()
+        finally:
+            self.results.put(_END)
+
+    def __iter__(self):
+        threads = [
+            threading.Thread(target=self._produce, name="frame-source", daemon=True),
+            threading.Thread(target=self._consume, name="frame-process", daemon=True),
+        ]
+        for t in threads:
+            t.start()
+        try:
+            while True:
+                item = self.results.get()
+                if item is _END:
+                    break
+                yield item
+        finally:
+            # consumer gone (end of stream, error or Ctrl+C): stop both stages
+            self._stop.set()
+            for q in (self.frames, self.results):
+                while True:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        break
+        if self._error is not None:
+            raise self._error
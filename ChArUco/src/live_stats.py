@@ -0,0 +1,193 @@
+import os
+import json
+import numpy as np
+
+
+class RunningStats:
+    """
+    Online statistics of K quantities (one vector per frame), O(1) per update:
+    Welford mean/variance and min/max over the whole run, and mean/std over the last
+    `window` frames (Welford with removal of the value leaving the ring buffer).
+    """
+    def __init__(self, names, window=50):
+        self.names = list(names)
+        self.window = max(int(window), 2)
+        k = len(self.names)
+        self.n = 0
+        self.mean = np.zeros(k)
+        self._m2 = np.zeros(k)
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+        self._ring = np.zeros((self.window, k))
+        self._roll_n = 0
+        self.roll_mean = np.zeros(k)
+        self._roll_m2 = np.zeros(k)
+
+    def update(self, values):
+        x = np.asarray(values, dtype=np.float64)
+        # whole run
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (x - self.mean)
+        np.minimum(self.min, x, out=self.min)
+        np.maximum(self.max, x, out=self.max)
+
+        # rolling window
+        slot = (self.n - 1) % self.window
+        if self._roll_n < self.window:
+            self._roll_n += 1
+            delta = x - self.roll_mean
+            self.roll_mean += delta / self._roll_n
+            self._roll_m2 += delta * (x - self.roll_mean)
+        else:
+            old = self._ring[slot]
+            new_mean = self.roll_mean + (x - old) / self.window
+            self._roll_m2 += (x - old) * (x - new_mean + old - self.roll_mean)
+            self.roll_mean = new_mean
+        self._ring[slot] = x
+        if slot == self.window - 1 and self._roll_n == self.window:
+            # once per lap, recomputed from the buffer: the add/remove updates do not accumulate round-off
+            self.roll_mean = self._ring.mean(axis=0)
+            self._roll_m2 = ((self._ring - self.roll_mean) ** 2).sum(axis=0)
+
+    @property
+    def std(self):
+        return np.sqrt(self._m2 / (self.n - 1)) if self.n > 1 else np.zeros_like(self.mean)
+
+    @property
+    def roll_std(self):
+        return np.sqrt(np.maximum(self._roll_m2, 0.0) / (self._roll_n - 1)) if self._roll_n > 1 else np.zeros_like(self.mean)
+
+    @property
+    def window_full(self):
+        return self._roll_n == self.window
+
+    def get(self, name):
+        """
+        Statistics of one quantity as dict.
+        """
+        i = self.names.index(name)
+        return {
+            "n": self.n, "mean": self.mean[i], "std": self.std[i], "min": self.min[i], "max": self.max[i],
+            "roll_n": self._roll_n, "roll_mean": self.roll_mean[i], "roll_std": self.roll_std[i],
+        }
+
+    def snapshot(self):
+        return {name: {k: (v if isinstance(v, int) else float(v)) for k, v in self.get(name).items()} for name in self.names}
+
+    def report(self):
+        lines = [f"{'value':<14}{'n':>7}{'mean':>12}{'std':>10}{'min':>12}{'max':>12}"
+                 f"{'roll mean':>12}{f'roll std({self.window})':>14}"]
+        std, roll_std = self.std, self.roll_std
+        for i, name in enumerate(self.names):
+            lines.append(
+                f"{name:<14}{self.n:>7}{self.mean[i]:>12.4f}{std[i]:>10.4f}{self.min[i]:>12.4f}{self.max[i]:>12.4f}"
+                f"{self.roll_mean[i]:>12.4f}{roll_std[i]:>14.4f}"
+            )
+        return "\n".join(lines)
+
+
+class DriftAlarm:
+    """
+    Fires when the rolling mean of `column` leaves the band [low, high] (and again when it
+    comes back). Checked only once the rolling window is full, so that the first frames do not trigger it.
+    """
+    def __init__(self, column, low, high):
+        if low >= high:
+            raise ValueError(f"Banda di drift non valida: [{low}, {high}]")
+        self.column, self.low, self.high = column, low, high
+        self.active = False
+        self.events = 0
+
+    def check(self, stats, img_name):
+        """
+        Message on a state change, otherwise None.
+        """
+        if not stats.window_full:
+            return None
+        value = stats.get(self.column)["roll_mean"]
+        outside = not (self.low <= value <= self.high)
+        if outside == self.active:
+            return None
+        self.active = outside
+        if outside:
+            self.events += 1
+            return (f"[DRIFT] {img_name}: media mobile di {self.column} = {value:+.4f} "
+                    f"fuori dalla banda [{self.low:+.4f}, {self.high:+.4f}] (ultimi {stats.window} frame)")
+        return f"[DRIFT] {img_name}: {self.column} rientrato nella banda ({value:+.4f})"
+
+
+class LiveMonitor:
+    """
+    Running statistics of the measured rows of a run: a summary line printed (and a JSON
+    snapshot written, if export_path) every `every` rows, and the optional drift alarm.
+    """
+    def __init__(self, names, window=50, every=10, export_path=None, alarm=None, summary_column="distance_mm",
+                 error_column="error_mm"):
+        self.stats = RunningStats(names, window)
+        self.every = max(int(every), 1)
+        self.export_path = export_path
+        self.alarm = alarm
+        self.summary_column = summary_column
+        self.error_column = error_column
+
+    def update(self, values, img_name):
+        self.stats.update(values)
+        if self.alarm is not None:
+            message = self.alarm.check(self.stats, img_name)
+            if message:
+                print(message)
+        if self.stats.n % self.every == 0:
+            print(self.line())
+            self.export()
+
+    def line(self):
+        s = self.stats.get(self.summary_column)
+        line = (f"[STATS] n={s['n']} {self.summary_column}: μ={s['mean']:.4f} σ={s['std']:.4f} "
+                f"σ{self.stats.window}={s['roll_std']:.4f}")
+        if self.error_column is None:
+            return line
+        e = self.stats.get(self.error_column)
+        return (f"{line} | {self.error_column}: μ{self.stats.window}={e['roll_mean']:+.4f} "
+                f"min={e['min']:+.4f} max={e['max']:+.4f}")
+
+    def export(self):
+        if not self.export_path:
+            return
+        # no rows yet: empty stats (min/max would be ±inf, not valid JSON)
+        stats = self.stats.snapshot() if self.stats.n else {}
+        snapshot = {"n": self.stats.n, "window": self.stats.window, "stats": stats}
+        if self.alarm is not None:
+            snapshot["drift"] = {"column": self.alarm.column, "band": [self.alarm.low, self.alarm.high],
+                                 "active": self.alarm.active, "events": self.alarm.events}
+        # write + rename, so that a dashboard polling the file never reads half of it
+        tmp_path = f"{self.export_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f, indent=1)
+        os.replace(tmp_path, self.export_path)
+
+    def close(self):
+        self.export()
+
+
+def make_monitor(args, names, summary_column="distance_mm", error_column="error_mm"):
+    """
+    LiveMonitor from settings.json ("live_stats", "live_stats_window", "live_stats_every",
+    "live_stats_file", "drift_band_mm"), or None when disabled. A drift band alone enables it.
+    The drift band applies to error_column; without it (no expected distance) the band is ignored.
+    """
+    band = getattr(args, "drift_band_mm", None)
+    if band is not None and error_column is None:
+        print("[WARN] drift_band_mm ignorato: nessuna distanza attesa per la coppia monitorata")
+        band = None
+    if not getattr(args, "live_stats", False) and band is None:
+        return None
+    alarm = DriftAlarm(error_column, *band) if band is not None else None
+    export_path = getattr(args, "live_stats_file", None)
+    if export_path:
+        os.makedirs(os.path.dirname(os.path.abspath(export_path)), exist_ok=True)
+    return LiveMonitor(
+        names, window=getattr(args, "live_stats_window", 50), every=getattr(args, "live_stats_every", 10),
+        export_path=export_path, alarm=alarm, summary_column=summary_column, error_column=error_column
+    )
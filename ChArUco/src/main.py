@@ -4,143 +4,665 @@ import glob
 import time
 import numpy as np
 import csv
+import argparse
+import multiprocessing as mp
+from types import SimpleNamespace
 
-from utils import load_camera_calibration,pose_to_matrix, offset_pose_to_center, rotation_matrix_to_quaternion, matrix_to_pose, parse_args_from_json
-from detect_charuco import create_charuco_boards, detect_two_charuco
+from utils import CameraModel, UNDISTORT_MODES, poses_to_matrices, offset_poses_to_center, relative_poses, translation_distances, rotation_matrices_to_quaternions, matrix_to_pose, parse_args_from_json
+from results_io import ColumnarWriter
+from frame_loader import FrameLoader, read_gray
+from timing import StageTimer, TimingSummary, ImageProfiler, STAGE_COLUMNS, stage
+from detect_charuco import create_charuco_board_set, detect_charuco_boards, CharucoEngine, BoardTracker
+from context_cache import load_run_settings, compile_run_settings
+from detection_cache import DetectionCache, marker_namespace, board_geometry_key, detect_charuco_boards_cached
 
 # REAL DISTANCE BETWEEN MARKERS: hypotenuse of 110 mm on X and Y (≈ 155.6 mm)
-EXPECTED_DISTANCE_M = 0.1308625232  #np.sqrt(0.11**2 + 0.11**2) #np.sqrt(0.11**2 + 0.11**2) 
+EXPECTED_DISTANCE_M = 0.1308625232  #np.sqrt(0.11**2 + 0.11**2) #np.sqrt(0.11**2 + 0.11**2)
 
-def main():
-    args = parse_args_from_json()
+# Local offset from the board origin (corner) to the centre of the 75 mm board
+BOARD_CENTER_OFFSET_M = np.array([0.0375, 0.0375, 0.0])
 
-    # 1. Load camera calibration
-    camera_matrix, dist_coeffs = load_camera_calibration(args.calib_file)
+CSV_HEADER = [
+    "image_name",
+    "M1_tx_mm", "M1_ty_mm", "M1_tz_mm",
+    "M2_tx_mm", "M2_ty_mm", "M2_tz_mm",
+    "tx_rel_mm", "ty_rel_mm", "tz_rel_mm",
+    "distance_mm", "error_mm",
+    "qx_rel_mm", "qy_rel_mm", "qz_rel_mm", "qw_rel_mm",
+    "elapsed_time_s"
+]
 
-    # 2. Creation of 2 CharucoBoard
-    board_size = (args.board_size, args.board_size)
-    board_physical_size = 0.075  # in meter
-    marker_length_ratio = args.marker_length_ratio
-    board1, board2, square_length, marker_length = create_charuco_boards(
-        board_size, board_physical_size, marker_length_ratio
-    )
+# Columns of every pair of boards in the N-board schema (prefix "C<i>_C<j>_")
+PAIR_COLUMNS = ["tx_rel_mm", "ty_rel_mm", "tz_rel_mm", "distance_mm", "error_mm", "qx_rel", "qy_rel", "qz_rel", "qw_rel"]
 
-    # 3. I prepare the output CSV (header + append mode)
-    os.makedirs(os.path.dirname(args.output_csv), exist_ok=True)
-    csv_file = open(args.output_csv, mode='w', newline='')
-    csv_writer = csv.writer(csv_file)
-    csv_writer.writerow([
-        "image_name",
-        "M1_tx_mm", "M1_ty_mm", "M1_tz_mm",
-        "M2_tx_mm", "M2_ty_mm", "M2_tz_mm",
-        "tx_rel_mm", "ty_rel_mm", "tz_rel_mm",
-        "distance_mm", "error_mm",
-        "qx_rel_mm", "qy_rel_mm", "qz_rel_mm", "qw_rel_mm",
-        "elapsed_time_s"
+# Images whose pose math is computed together in one vectorized call
+POSE_BATCH_SIZE = 64
+
+# Per-process state of the batch workers (filled once by _init_worker)
+_WORKER_CTX = None
+
+
+class ResultSchema:
+    """
+    Result columns and pose math of a run with n_boards boards. With 2 boards (C1/C2 on the
+    plate) it is the legacy CSV_HEADER; with more, the absolute pose of every board followed by
+    the relative pose, distance and error of every pair i < j (PAIR_COLUMNS), error = distance
+    minus expected_distances_mm["C<i>_C<j>"] (NaN for the pairs without an expected distance).
+    """
+    def __init__(self, n_boards=2, expected_distances_mm=None):
+        if n_boards < 2:
+            raise ValueError(f"n_boards deve essere almeno 2, non {n_boards}")
+        self.n_boards = n_boards
+        self.names = [f"C{i + 1}" for i in range(n_boards)]
+        self.pairs = np.triu_indices(n_boards, 1)
+        self.legacy = n_boards == 2
+        if self.legacy:
+            self.header = CSV_HEADER
+            self.distance_column, self.error_column = "distance_mm", "error_mm"
+            self.expected_mm = np.array([EXPECTED_DISTANCE_M * 1000.0])
+        else:
+            expected = expected_distances_mm or {}
+            pair_names = [f"{self.names[i]}_{self.names[j]}" for i, j in zip(*self.pairs)]
+            self.expected_mm = np.array([expected.get(p, np.nan) for p in pair_names], dtype=np.float64)
+            self.header = (
+                ["image_name"]
+                + [f"M{i + 1}_t{c}_mm" for i in range(n_boards) for c in "xyz"]
+                + [f"{p}_{c}" for p in pair_names for c in PAIR_COLUMNS]
+                + ["elapsed_time_s"]
+            )
+            self.distance_column, self.error_column = f"{pair_names[0]}_distance_mm", f"{pair_names[0]}_error_mm"
+        # live statistics: every numeric column but the time, and the errors without expected distance
+        missing = {f"{self.names[i]}_{self.names[j]}_error_mm"
+                   for i, j, e in zip(*self.pairs, self.expected_mm) if np.isnan(e)}
+        self.stats_index = [k for k, c in enumerate(self.header[1:-1], start=1) if c not in missing]
+        self.stats_columns = [self.header[k] for k in self.stats_index]
+        if self.error_column in missing:
+            self.error_column = None
+
+    def compute_poses(self, poses):
+        """
+        Pose math of N images in one vectorized call, from their flat pose tuples
+        (rvec1, tvec1, ..., rvecN, tvecN). Returns the arguments of build_rows.
+        """
+        arrays = [np.array([pose[k] for pose in poses]) for k in range(2 * self.n_boards)]
+        if self.legacy:
+            return compute_relative_poses(*arrays)
+        return compute_board_set_poses(np.stack(arrays[0::2], axis=1), np.stack(arrays[1::2], axis=1), self.pairs)
+
+    def build_rows(self, img_names, poses, elapsed, timers=None):
+        """
+        CSV rows of the images from the output of compute_poses.
+        """
+        if self.legacy:
+            return build_csv_rows(img_names, *poses, elapsed, timers)
+        return build_board_set_rows(img_names, *poses, self.expected_mm, elapsed, timers)
+
+    def board_centers(self, pose):
+        """
+        Centred 4x4 pose of every board of one image (for the debug view).
+        """
+        rvecs, tvecs = np.array(pose[0::2]), np.array(pose[1::2])
+        return offset_poses_to_center(poses_to_matrices(rvecs, tvecs), BOARD_CENTER_OFFSET_M)
+
+
+def result_schema(args):
+    """
+    ResultSchema of the run from settings.json ("n_boards", default 2, and "expected_distances_mm").
+    """
+    return ResultSchema(getattr(args, "n_boards", 2), getattr(args, "expected_distances_mm", None))
+
+
+class RunContext:
+    """
+    Everything a measurement needs that does not change between images:
+    calibration, the CharucoBoard objects ("n_boards", C1/C2 by default) and their detection engine.
+    Built once per process. The parsed calibration and detector profile come from the
+    run-context cache (context_cache.py) unless "run_cache" is false in settings.json.
+    """
+    def __init__(self, args):
+        compiled = load_run_settings(args) if getattr(args, "run_cache", True) else compile_run_settings(args)
+
+        # 1. Load camera calibration (undistortion data cached in the CameraModel)
+        self.camera_model = CameraModel(compiled["camera_matrix"], compiled["dist_coeffs"])
+        self.camera_matrix, self.dist_coeffs = self.camera_model.camera_matrix, self.camera_model.dist_coeffs
+        self.undistort = getattr(args, "undistort", "none")
+        if self.undistort not in UNDISTORT_MODES:
+            raise ValueError(f"Unknown undistort mode '{self.undistort}' (available: {', '.join(UNDISTORT_MODES)})")
+
+        # 2. Creation of the CharucoBoards (disjoint ID blocks)
+        self.schema = result_schema(args)
+        board_size = (args.board_size, args.board_size)
+        board_physical_size = 0.075  # in meter
+        self.boards, self.square_length, self.marker_length = create_charuco_board_set(
+            self.schema.n_boards, board_size, board_physical_size, args.marker_length_ratio
+        )
+        self.board1, self.board2 = self.boards[:2]
+
+        # 3. Detector engine (named profile from settings.json)
+        self.profile = compiled["profile"]
+        # with undistort="image" the detector only ever sees undistorted images
+        detect_dist_coeffs = self.camera_model.zero_dist_coeffs if self.undistort == "image" else self.dist_coeffs
+        self.engine = CharucoEngine(
+            self.boards, self.camera_matrix, detect_dist_coeffs, profile=self.profile, names=self.schema.names,
+            pyramid_scale=getattr(args, "pyramid_scale", 1.0),
+            warm_start=getattr(args, "pose_warm_start", "none"),
+            undistort_model=self.camera_model if self.undistort == "points" else None
+        )
+
+        # 4. Optional ROI tracking between consecutive frames
+        self.tracker = None
+        if getattr(args, "tracking", False):
+            self.tracker = BoardTracker(
+                self.engine, self.camera_matrix, detect_dist_coeffs,
+                padding=getattr(args, "tracking_padding", 0.25)
+            )
+
+        # 5. Optional per-stage timing (extra CSV columns + end-of-run summary)
+        self.stage_timing = getattr(args, "stage_timing", False)
+
+        # 6. Optional on-disk detection cache: re-analysis runs solve the poses from cached corners
+        self.detection_cache = None
+        if getattr(args, "detection_cache", None):
+            pyramid_scale = getattr(args, "pyramid_scale", 1.0)
+            self.detection_cache = DetectionCache(
+                args.detection_cache, getattr(args, "detection_cache_max_mb", 512),
+                namespace=marker_namespace(compiled["profile_params"], pyramid_scale, self.undistort,
+                                           self.camera_matrix, self.dist_coeffs)
+            )
+            self.geometry_key = board_geometry_key(self.boards, self.camera_matrix, detect_dist_coeffs)
+
+    def new_timer(self):
+        """
+        StageTimer for the next image, or None when stage timing is off.
+        """
+        return StageTimer() if self.stage_timing else None
+
+
+def compute_relative_poses(rvecs1, tvecs1, rvecs2, tvecs2):
+    """
+    Pose math of N images in one vectorized call, from the (N,3) rvecs/tvecs of C1 and C2:
+    centred absolute poses and relative transform of C2 in the frame of C1.
+    Returns (T1_center, T2_center, T_rel, q_rel) with shapes (N,4,4), (N,4,4), (N,4,4), (N,4).
+    """
+    # 1. Convert to 4x4 matrices
+    T1 = poses_to_matrices(rvecs1, tvecs1)
+    T2 = poses_to_matrices(rvecs2, tvecs2)
+
+    #2. Apply offset to move to the center of the board
+    T1_center = offset_poses_to_center(T1, BOARD_CENTER_OFFSET_M)
+    T2_center = offset_poses_to_center(T2, BOARD_CENTER_OFFSET_M)
+
+    # 3. Relative transformation (closed-form rigid inverse)
+    T_rel = relative_poses(T1_center, T2_center)
+
+    # 4. Quaternion
+    q_rel = rotation_matrices_to_quaternions(T_rel[:, :3, :3])
+    return T1_center, T2_center, T_rel, q_rel
+
+
+def compute_board_set_poses(rvecs, tvecs, pairs):
+    """
+    Pose math of N images with B boards in one vectorized call, from (N,B,3) rvecs/tvecs:
+    centred absolute poses and relative transform of board j in the frame of board i for every
+    pair (i, j) of pairs = (I, J) index arrays. Returns (T_center, T_rel, q_rel) with shapes
+    (N,B,4,4), (N,P,4,4), (N,P,4).
+    """
+    n, n_boards = rvecs.shape[:2]
+    T = poses_to_matrices(rvecs.reshape(-1, 3), tvecs.reshape(-1, 3))
+    T_center = offset_poses_to_center(T, BOARD_CENTER_OFFSET_M).reshape(n, n_boards, 4, 4)
+    I, J = pairs
+    T_rel = relative_poses(T_center[:, I].reshape(-1, 4, 4), T_center[:, J].reshape(-1, 4, 4))
+    q_rel = rotation_matrices_to_quaternions(T_rel[:, :3, :3])
+    return T_center, T_rel.reshape(n, len(I), 4, 4), q_rel.reshape(n, len(I), 4)
+
+
+def build_board_set_rows(img_names, T_center, T_rel, q_rel, expected_mm, elapsed, timers=None):
+    """
+    CSV rows (all in mm) of the N-board schema (ResultSchema) from compute_board_set_poses.
+    """
+    n = len(T_center)
+    t_rel_mm = T_rel[:, :, :3, 3] * 1000.0
+    distance_mm = np.linalg.norm(t_rel_mm, axis=2)
+    error_mm = distance_mm - expected_mm
+    per_pair = np.concatenate([t_rel_mm, distance_mm[..., None], error_mm[..., None], q_rel], axis=2)
+    values = np.concatenate([(T_center[:, :, :3, 3] * 1000.0).reshape(n, -1), per_pair.reshape(n, -1)], axis=1)
+    rows = [
+        [img_name, *vals, f"{el:.4f}"]
+        for img_name, vals, el in zip(img_names, values.tolist(), elapsed)
+    ]
+    if timers is not None:
+        for row, timer in zip(rows, timers):
+            row.extend(f"{t:.6f}" for t in timer.columns())
+    return rows
+
+
+def build_csv_rows(img_names, T1_center, T2_center, T_rel, q_rel, elapsed, timers=None):
+    """
+    Formats the CSV rows (all in mm) of N images from the output of compute_relative_poses.
+    With timers (one StageTimer per image) the STAGE_COLUMNS are appended to each row.
+    """
+    # Convert translation and distance to mm
+    t_rel_mm = T_rel[:, :3, 3] * 1000.0                   # tx, ty, tz in mm
+    distance_mm = translation_distances(T_rel) * 1000.0   # distance in mm
+    error_mm = distance_mm - (EXPECTED_DISTANCE_M * 1000.0)
+
+    values = np.column_stack([
+        T1_center[:, :3, 3] * 1000.0,  # traslazioni assolute dei due marker
+        T2_center[:, :3, 3] * 1000.0,
+        t_rel_mm,
+        distance_mm,
+        error_mm,
+        q_rel,
     ])
+    rows = [
+        [img_name, *vals, f"{el:.4f}"]
+        for img_name, vals, el in zip(img_names, values.tolist(), elapsed)
+    ]
+    if timers is not None:
+        for row, timer in zip(rows, timers):
+            row.extend(f"{t:.6f}" for t in timer.columns())
+    return rows
+
+
+def measure_frame(img_gray, ctx, timer=None):
+    """
+    Detects the boards (C1/C2, or C1..CN) in an already decoded gray image.
+    Returns (pose, warning): pose is (rvec1, tvec1, rvec2, tvec2, ...),
+    or None with a warning message if the image is skipped.
+    """
+    # 4.1. Marker detection (the image undistortion is counted in the "detect" stage)
+    if ctx.undistort == "image":
+        with stage(timer, "detect"):
+            img_gray = ctx.camera_model.undistort_image(img_gray)
+    detected = detect_charuco_boards(img_gray, ctx.engine, require_all=True, tracker=ctx.tracker, timer=timer)
+    return poses_from_detected(detected, ctx.schema.names)
+
+
+def poses_from_detected(detected, names=("C1", "C2")):
+    """
+    (pose, warning) of measure_frame from the output of detect_charuco_boards.
+    """
+    if len(detected) != len(names):
+        return None, f"rilevati {len(detected)} marker (ne servono {len(names)}) → salto."
 
-    # 4. Image List
-    img_paths = sorted(glob.glob(os.path.join(args.input_dir, "*.*")))
-    total = len(img_paths)
-    print(f"[INFO] Trovate {total} immagini in {args.input_dir}")
+    # 4.2. Pose recovery
+    pose_dict = {marker_id: (rvec, tvec) for marker_id, rvec, tvec in detected}
+    missing = [name for name in names if name not in pose_dict]
+    if missing:
+        return None, f"mancano marker {' o '.join(missing)} → salto."
 
-    for idx, img_path in enumerate(img_paths, start=1):
+    return tuple(v for name in names for v in pose_dict[name]), None
+
+
+def measure_image(img_path, ctx, timer=None):
+    """
+    Reads one image (straight to gray) and detects C1/C2.
+    Returns (img_name, pose, warning) as measure_frame.
+    With the detection cache, the file is hashed and only decoded if the cache misses.
+    """
+    img_name = os.path.basename(img_path)
+    if ctx.detection_cache is not None:
+        return (img_name, *measure_image_cached(img_path, ctx, timer))
+    try:
+        with stage(timer, "read"):
+            img_gray = read_gray(img_path)
+    except Exception as e:
+        return img_name, None, f"errore lettura → salto. ({e})"
+    return (img_name, *measure_frame(img_gray, ctx, timer))
+
+
+def measure_image_cached(img_path, ctx, timer=None):
+    """
+    measure_image backed by ctx.detection_cache (no ROI tracking: a cached entry is
+    always a full-frame detection).
+    """
+    try:
+        with stage(timer, "read"):
+            with open(img_path, "rb") as f:
+                img_bytes = f.read()
+    except OSError as e:
+        return None, f"errore lettura → salto. ({e})"
+
+    def load_image():
+        img_gray = cv2.imdecode(np.frombuffer(img_bytes, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        if img_gray is None:
+            raise IOError(f"Impossibile leggere {img_path}")
+        if ctx.undistort == "image":
+            img_gray = ctx.camera_model.undistort_image(img_gray)
+        return img_gray
+
+    try:
+        detected = detect_charuco_boards_cached(
+            img_bytes, load_image, ctx.engine, ctx.detection_cache, ctx.geometry_key, timer
+        )
+    except IOError as e:
+        return None, f"errore lettura → salto. ({e})"
+    return poses_from_detected(detected, ctx.schema.names)
+
+
+def _init_worker(config):
+    """
+    Pool initializer: every worker loads calibration and boards only once.
+    OpenCV is pinned to one thread so that N processes use N cores without
+    oversubscribing them. config is the plain settings dict (picklable also
+    with the "spawn" start method used on Windows).
+    """
+    global _WORKER_CTX
+    cv2.setNumThreads(1)
+    _WORKER_CTX = RunContext(SimpleNamespace(**config))
+
+
+def _measure_in_worker(img_path):
+    """
+    Pool task: detects one image and returns only the poses; the pose math
+    runs batched in the parent (the image itself is not sent back).
+    """
+    start_t = time.time()
+    timer = _WORKER_CTX.new_timer()
+    img_name, pose, warning = measure_image(img_path, _WORKER_CTX, timer)
+    return img_name, pose, warning, time.time() - start_t, timer, start_t
+
+
+def resolve_workers(args):
+    """
+    Number of worker processes from settings.json ("workers": 1 by default, 0 → all cores).
+    Debug mode needs the interactive window, so it always runs in-process.
+    """
+    workers = getattr(args, "workers", 1)
+    if args.debug:
+        return 1
+    if workers is None or workers <= 0:
+        workers = os.cpu_count() or 1
+    if workers > 1:
+        # frame-to-frame state only follows the frames of each worker
+        stateful = [key for key, off in (("tracking", False), ("pose_warm_start", "none"))
+                    if getattr(args, key, off) not in (off, None)]
+        if stateful:
+            print(f"[WARN] {', '.join(stateful)} con {workers} worker: ogni worker segue solo i propri frame "
+                  f"(\"workers\": 1 per la sequenza completa)")
+    return workers
+
+
+def show_debug(img_gray, ctx, pose):
+    """
+    Draws the centred axes of every board and waits for a key (ESC to exit).
+    """
+    debug_img = cv2.cvtColor(img_gray, cv2.COLOR_GRAY2BGR)
+    axis_length = 0.035  #  3,5 cm
+
+    for T_center in ctx.schema.board_centers(pose):
+        # Convert centered pose to rvec/tvec and draw axes from the real center of the board
+        rvec_center, tvec_center = matrix_to_pose(T_center)
+        cv2.drawFrameAxes(debug_img, ctx.camera_matrix, ctx.dist_coeffs, rvec_center, tvec_center, axis_length)
+
+    # Resizing and interactive window
+    scale_factor = 0.5
+    debug_resized = cv2.resize(debug_img, (0, 0), fx=scale_factor, fy=scale_factor)
+    cv2.namedWindow("DEBUG", cv2.WINDOW_NORMAL)
+    cv2.imshow("DEBUG", debug_resized)
+    cv2.resizeWindow("DEBUG", 960, 720)
+    cv2.moveWindow("DEBUG", 100, 100)
+
+    key = cv2.waitKey(0)
+    if key == 27:  # ESC for exit
+        cv2.destroyAllWindows()
+        exit()
+
+
+def iter_measurements(img_paths, args, workers):
+    """
+    Yields (img_name, pose, warning, elapsed, timer, t_capture) in the same order as img_paths
+    (timer is the StageTimer of the image, None without stage timing; t_capture is the
+    time.time() at which the image started to be read).
+    With workers > 1 the images are spread over a process pool; imap keeps
+    the input order, so the CSV is identical to the serial run.
+    In-process, the next images are prefetched (decoded to gray) on background
+    threads while the current one is measured.
+    """
+    if workers > 1:
+        chunksize = max(1, len(img_paths) // (workers * 8))
+        with mp.Pool(workers, initializer=_init_worker, initargs=(vars(args),)) as pool:
+            yield from pool.imap(_measure_in_worker, img_paths, chunksize=chunksize)
+        return
+
+    ctx = RunContext(args)
+    if ctx.detection_cache is not None:
+        # cached re-analysis: most images are never decoded, so there is nothing to prefetch
+        for img_path in img_paths:
+            start_t = time.time()
+            timer = ctx.new_timer()
+            img_name, pose, warning = measure_image(img_path, ctx, timer)
+            if pose is not None and args.debug:
+                show_debug(read_gray(img_path), ctx, pose)
+            yield img_name, pose, warning, time.time() - start_t, timer, start_t
+        return
+
+    frames = iter(FrameLoader(img_paths, prefetch=getattr(args, "prefetch", 4)))
+    while True:
         start_t = time.time()
+        timer = ctx.new_timer()
+        # with prefetch the "read" stage is the wait for the frame (zero when the prefetch keeps up)
+        with stage(timer, "read"):
+            frame = next(frames, None)
+        if frame is None:
+            return
+        img_path, img_gray, error = frame
         img_name = os.path.basename(img_path)
-
-        try:
-            img_bgr = cv2.imread(img_path)
-            if img_bgr is None:
-                raise IOError(f"Impossibile leggere {img_path}")
-        except Exception as e:
-            print(f"[WARNING] Immagine {img_name}: errore lettura → salto. ({e})")
+        if img_gray is None:
+            yield img_name, None, f"errore lettura → salto. ({error})", time.time() - start_t, timer, start_t
             continue
+        pose, warning = measure_frame(img_gray, ctx, timer)
+        if pose is not None and args.debug:
+            show_debug(img_gray, ctx, pose)
+        yield img_name, pose, warning, time.time() - start_t, timer, start_t
+
+
+def stream_pipeline(source, args):
+    """
+    FramePipeline that measures the frames of a stream source (frame_source.py) in-process,
+    one frame at a time in capture order. Detection runs on its own thread, so reading
+    the next frames and writing the results overlap with it.
+    """
+    from frame_source import FramePipeline
+
+    ctx = RunContext(args)
+
+    def process(frame):
+        start_t = time.time()
+        timer = ctx.new_timer()
+        if frame.image is None:
+            return None, f"errore lettura → salto. ({frame.error})", time.time() - start_t, timer
+        pose, warning = measure_frame(frame.image, ctx, timer)
+        return pose, warning, time.time() - start_t, timer
+
+    return FramePipeline(
+        source, process,
+        queue_size=getattr(args, "queue_size", 8),
+        policy=getattr(args, "queue_policy", "block")
+    )
 
-        # 4.1. Marker detection
-        detected = detect_two_charuco(img_bgr, board1, board2, camera_matrix, dist_coeffs)
-        if len(detected) != 2:
-            print(f"[WARNING] {img_name}: rilevati {len(detected)} marker (ne servono 2) → salto.")
-            continue
 
-        # 4.2. Pose recovery
-        pose_dict = {marker_id: (rvec, tvec) for marker_id, rvec, tvec in detected}
-        if not ("C1" in pose_dict and "C2" in pose_dict):
-            print(f"[WARNING] {img_name}: mancano marker C1 o C2 → salto.")
+def write_batch(pending, writers, total, summary=None, latencies=None, monitor=None, schema=None):
+    """
+    Runs the pose math of the buffered images in one vectorized call, then writes
+    and prints them in their original order. pending holds (idx, img_name, pose, warning, elapsed, timer, t_capture);
+    writers are csv.writer-like objects (CSV and optional columnar output).
+    With stage timing, the timers of the written images are collected in summary.
+    With a latencies list, the end-to-end latency (capture → row written) of every image is
+    appended to it and printed. total is None for streams of unknown length.
+    With a LiveMonitor (live_stats.py) the running statistics are updated with every row.
+    schema is the ResultSchema of the run (default: the two boards C1/C2).
+    """
+    if schema is None:
+        schema = ResultSchema()
+    done = [item for item in pending if item[2] is not None]
+    rows = iter(())
+    if done:
+        start_t = time.time()
+        start_w, start_c = time.perf_counter(), time.process_time()
+        poses = schema.compute_poses([item[2] for item in done])
+        # share of the batched pose math added to each image
+        math_t = (time.time() - start_t) / len(done)
+        timers = None
+        if summary is not None:
+            timers = [item[5] for item in done]
+            math_w = (time.perf_counter() - start_w) / len(done)
+            math_c = (time.process_time() - start_c) / len(done)
+            for timer in timers:
+                timer.add("math", math_w, math_c)
+        rows = iter(schema.build_rows(
+            [item[1] for item in done], poses, [item[4] + math_t for item in done], timers
+        ))
+
+    distance_idx = schema.header.index(schema.distance_column)
+    for idx, img_name, pose, warning, _, timer, t_capture in pending:
+        if pose is None:
+            print(f"[WARNING] {img_name}: {warning}")
             continue
 
-        rvec1, tvec1 = pose_dict["C1"]
-        rvec2, tvec2 = pose_dict["C2"]
+        # 5. CSV save (all in mm)
+        row = next(rows)
+        with stage(timer, "write"):
+            for writer in writers:
+                writer.writerow(row)
+        if summary is not None:
+            summary.add(timer)
 
-        # 1. Convert to 4x4 matrices
-        T1 = pose_to_matrix(rvec1, tvec1)
-        T2 = pose_to_matrix(rvec2, tvec2)
+        distance_mm, error_mm = row[distance_idx], row[distance_idx + 1]
+        progress = f"{idx}/{total}" if total is not None else f"{idx}"
+        latency = ""
+        if latencies is not None:
+            latencies.append(time.time() - t_capture)
+            latency = f", lat={latencies[-1] * 1000.0:.0f} ms"
+        print(f"[{progress}] {img_name} → Δ= {distance_mm / 1000.0:.4f} m (err={error_mm:+.1f} mm{latency})")
+        if monitor is not None:
+            monitor.update([row[k] for k in schema.stats_index], img_name)
 
-        #2. Apply offset to move to the center of the board
-        offset = np.array([0.0375, 0.0375, 0.0])
-        T1_center = offset_pose_to_center(T1, offset)
-        T2_center = offset_pose_to_center(T2, offset)
 
-        # Estrai traslazioni assolute dei due marker (già in metri)
-        t_abs1_mm = (T1_center[:3, 3] * 1000.0).tolist()
-        t_abs2_mm = (T2_center[:3, 3] * 1000.0).tolist()
+def main():
+    parser = argparse.ArgumentParser(description="Distance measurement between the two ChArUco boards.")
+    parser.add_argument("--profile", nargs="?", const="../../output/main.prof", metavar="PROF_FILE",
+                        help="cProfile the run (serial, no prefetch): aggregate saved to PROF_FILE, "
+                             "top functions of every image in <PROF_FILE>_per_image.txt")
+    parser.add_argument("--profile-top", type=int, default=15, help="functions listed per image with --profile")
+    cli = parser.parse_args()
 
-        # 3. Relative transformation
-        T_rel = np.linalg.inv(T1_center) @ T2_center
-        t_rel = T_rel[:3, 3]
-        R_rel = T_rel[:3, :3]
-        distance = np.linalg.norm(t_rel)
+    args = parse_args_from_json()
+    profiler = None
+    if cli.profile:
+        # one process and the reads in the main thread, so that cProfile sees the whole pipeline
+        args.workers, args.prefetch = 1, 0
+        os.makedirs(os.path.dirname(os.path.abspath(cli.profile)), exist_ok=True)
+        profiler = ImageProfiler(cli.profile, cli.profile_top)
 
-        # 4. Quaternion
-        q_rel = rotation_matrix_to_quaternion(R_rel)
+    run(args, profiler=profiler)
+    if profiler is not None:
+        profiler.close()
+        print(f"[DONE] Profile saved in: {cli.profile} (per image: {profiler.report_path})")
 
-        if args.debug:
-            debug_img = img_bgr.copy()
-            axis_length = 0.035  #  3,5 cm
 
-            # Convert centered pose to rvec/tvec
-            rvec1_center, tvec1_center = matrix_to_pose(T1_center)
-            rvec2_center, tvec2_center = matrix_to_pose(T2_center)
+def run(args, source=None, profiler=None):
+    """
+    Measures every image of the run and writes the results.
+    By default the images are the files of input_dir; with "source": "watch"/"video" in
+    settings.json, or an explicit frame source (e.g. frame_source.GeneratorSource wrapping
+    the camera), frames are measured as a stream through bounded queues.
+    """
+    if source is None and getattr(args, "source", "directory") != "directory":
+        from frame_source import open_frame_source
+        source = open_frame_source(args)
 
-            # Draw axes from the real center of the board
-            cv2.drawFrameAxes(debug_img, camera_matrix, dist_coeffs, rvec1_center, tvec1_center, axis_length)
-            cv2.drawFrameAxes(debug_img, camera_matrix, dist_coeffs, rvec2_center, tvec2_center, axis_length)
+    # result columns of the boards of the run, plus the optional per-stage timing columns
+    schema = result_schema(args)
+    header = schema.header + STAGE_COLUMNS if getattr(args, "stage_timing", False) else schema.header
+    summary = TimingSummary() if getattr(args, "stage_timing", False) else None
+    # optional running statistics and drift alarm (modules imported only when enabled)
+    monitor = None
+    if getattr(args, "live_stats", False) or getattr(args, "drift_band_mm", None) is not None:
+        from live_stats import make_monitor
+        monitor = make_monitor(args, schema.stats_columns, schema.distance_column, schema.error_column)
 
-            # Resizing and interactive window
-            scale_factor = 0.5
-            debug_resized = cv2.resize(debug_img, (0, 0), fx=scale_factor, fy=scale_factor)
-            cv2.namedWindow("DEBUG", cv2.WINDOW_NORMAL)
-            cv2.imshow("DEBUG", debug_resized)
-            cv2.resizeWindow("DEBUG", 960, 720)
-            cv2.moveWindow("DEBUG", 100, 100)
+    # 3. I prepare the output CSV (header + append mode)
+    os.makedirs(os.path.dirname(args.output_csv), exist_ok=True)
+    csv_file = open(args.output_csv, mode='w', newline='')
+    csv_writer = csv.writer(csv_file)
+    csv_writer.writerow(header)
+    writers = [csv_writer]
 
-            key = cv2.waitKey(0)
-            if key == 27:  # ESC for exit
-                cv2.destroyAllWindows()
-                exit()
+    # optional typed columnar copy of the results (.npy structured array, memory-mappable)
+    columnar_writer = None
+    if getattr(args, "output_columnar", None):
+        columnar_writer = ColumnarWriter(
+            args.output_columnar, header, chunk_rows=getattr(args, "columnar_chunk_rows", 1024)
+        )
+        writers.append(columnar_writer)
 
-        elapsed = time.time() - start_t
+    # optional SQLite run registry: the run (settings, profile, calibration hash) and every row,
+    # with every board and every pair (i, j) of N-board runs
+    registry_writer = None
+    if getattr(args, "run_registry", None):
+        from run_registry import open_run_writer
+        registry_writer = open_run_writer(args, header)
+    if registry_writer is not None:
+        writers.append(registry_writer)
 
-        # Convert translation and distance to mm
-        t_rel_mm = (t_rel * 1000.0).tolist()        # tx, ty, tz in mm
-        distance_mm = distance * 1000.0             # distance in mm
-        error_mm = distance_mm - (EXPECTED_DISTANCE_M * 1000.0)
+    pipeline, latencies = None, None
+    if source is None:
+        # 4. Image List
+        img_paths = sorted(glob.glob(os.path.join(args.input_dir, "*.*")))
+        total = len(img_paths)
+        workers = resolve_workers(args)
+        print(f"[INFO] Trovate {total} immagini in {args.input_dir} (worker: {workers})")
+        results = iter_measurements(img_paths, args, workers)
+        # in debug mode every image is written as soon as it is shown;
+        # when profiling, so that each image profile also covers its pose math and CSV write
+        batch_size = 1 if args.debug or profiler is not None else POSE_BATCH_SIZE
+    else:
+        # stream: every frame is written as soon as it is measured, to keep the latency low
+        total, batch_size, latencies = None, 1, []
+        pipeline = stream_pipeline(source, args)
+        print(f"[INFO] Stream da {type(source).__name__} (coda: {pipeline.frames.maxsize}, policy: {pipeline.policy})")
+        results = ((frame.name, *result, frame.t_capture) for frame, result in pipeline)
 
-        # 5. CSV save (all in mm)
-        csv_writer.writerow([
-            img_name,
-            *t_abs1_mm,
-            *t_abs2_mm,
-            *t_rel_mm,
-            distance_mm,
-            error_mm,
-            *q_rel.tolist(),
-            f"{elapsed:.4f}"
-        ])
-
-        print(f"[{idx}/{total}] {img_name} → Δ= {distance:.4f} m (err={error_mm:+.1f} mm)")
+    pending = []
+    if profiler is not None:
+        profiler.start()
+    for idx, result in enumerate(results, start=1):
+        pending.append((idx, *result))
+        if len(pending) >= batch_size:
+            write_batch(pending, writers, total, summary, latencies, monitor, schema)
+            pending = []
+        if profiler is not None:
+            profiler.stop(result[0])
+            profiler.start()
+    if profiler is not None:
+        profiler.cancel()
+    write_batch(pending, writers, total, summary, latencies, monitor, schema)
 
     csv_file.close()
     print(f"[DONE] Output saved in: {args.output_csv}")
+    if columnar_writer is not None:
+        columnar_writer.close()
+        print(f"[DONE] Columnar output saved in: {args.output_columnar}")
+    if registry_writer is not None:
+        registry_writer.close()
+        print(f"[DONE] Run {registry_writer.run_id} registrata in: {args.run_registry}")
+    if summary is not None:
+        print("[TIMING] Tempi per fase (immagini misurate):")
+        print(summary.report())
+    if monitor is not None:
+        # final snapshot also for an empty run, so that live_stats_file never shows the previous run
+        monitor.close()
+        if monitor.stats.n:
+            print("[STATS] Statistiche della run (mm):")
+            print(monitor.stats.report())
+            if monitor.alarm is not None:
+                print(f"[STATS] Allarmi di drift: {monitor.alarm.events}")
+    if pipeline is not None:
+        print(f"[STREAM] Frame scartati: {pipeline.dropped}")
+        if latencies:
+            p50, p95 = np.percentile(latencies, [50, 95]) * 1000.0
+            print(f"[STREAM] Latenza end-to-end: p50={p50:.1f} ms, p95={p95:.1f} ms, max={max(latencies) * 1000.0:.1f} ms")
 
 if __name__ == "__main__":
     main()
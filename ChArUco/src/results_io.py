@@ -0,0 +1,104 @@
+import os
+import numpy as np
+
+# Fixed width of the image_name field (characters)
+IMAGE_NAME_LEN = 128
+
+# .npy format 1.0: magic string, version, little-endian uint16 header length
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+# Room reserved in the header for the final row count
+_SHAPE_DIGITS = 20
+
+
+def results_dtype(header):
+    """
+    Typed schema of the results: a structured dtype with one field per CSV column,
+    image_name as fixed-width string and every other column as float64.
+    """
+    return np.dtype([
+        (name, f"U{IMAGE_NAME_LEN}") if name == "image_name" else (name, np.float64)
+        for name in header
+    ])
+
+
+def _npy_header(dtype, n_rows):
+    """
+    Header of a .npy v1.0 file with shape (n_rows,), padded to a fixed length
+    (independent of n_rows) so that it can be rewritten in place on close.
+    """
+    descr = np.lib.format.dtype_to_descr(dtype)
+    shape = f"({n_rows},)".ljust(_SHAPE_DIGITS + 3)
+    text = f"{{'descr': {descr!r}, 'fortran_order': False, 'shape': {shape}}}"
+    # magic (8) + length (2) + text + '\n' must be a multiple of 64 bytes
+    total = len(_NPY_MAGIC) + 2 + len(text) + 1
+    text += " " * (-total % 64) + "\n"
+    if len(text) > 0xFFFF:
+        raise ValueError("Results schema too large for a .npy v1.0 header")
+    return _NPY_MAGIC + len(text).to_bytes(2, "little") + text.encode("latin1")
+
+
+class ColumnarWriter:
+    """
+    Writes the result rows to a NumPy structured-array file (.npy) alongside the CSV.
+    Rows are buffered and written in chunks of chunk_rows; the file can then be opened
+    zero-copy with load_results (np.load with mmap_mode="r").
+    It has the same writerow() method as csv.writer, so both can be fed the same rows.
+    """
+    def __init__(self, path, header, chunk_rows=1024):
+        self.path = path
+        self.dtype = results_dtype(header)
+        self.names = self.dtype.names
+        self.n_rows = 0
+        self._chunk = np.zeros(chunk_rows, dtype=self.dtype)
+        self._filled = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "wb")
+        self._file.write(_npy_header(self.dtype, 0))
+
+    def writerow(self, row):
+        """
+        Appends one row, given as for csv.writer (numbers may also be strings, e.g. elapsed_time_s).
+        """
+        self._chunk[self._filled] = tuple(
+            value if name == "image_name" else float(value) for name, value in zip(self.names, row)
+        )
+        self._filled += 1
+        if self._filled == len(self._chunk):
+            self.flush()
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def flush(self):
+        if self._filled:
+            self._file.write(self._chunk[:self._filled].tobytes())
+            self.n_rows += self._filled
+            self._filled = 0
+        self._file.flush()
+
+    def close(self):
+        """
+        Writes the last chunk and the final row count into the header.
+        """
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.seek(0)
+        self._file.write(_npy_header(self.dtype, self.n_rows))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_results(path):
+    """
+    Memory-mapped, read-only structured array of a results file written by ColumnarWriter:
+    results["error_mm"] is a zero-copy float64 view of that column.
+    """
+    return np.load(path, mmap_mode="r")
@@ -0,0 +1,406 @@
+import os
+import re
+import csv
+import json
+import sqlite3
+import argparse
+from datetime import datetime, timezone
+
+from context_cache import file_hash
+
+# Numeric result columns stored per image (same names and order as the CSV, image_name excluded)
+RESULT_COLUMNS = [
+    "M1_tx_mm", "M1_ty_mm", "M1_tz_mm",
+    "M2_tx_mm", "M2_ty_mm", "M2_tz_mm",
+    "tx_rel_mm", "ty_rel_mm", "tz_rel_mm",
+    "distance_mm", "error_mm",
+    "qx_rel_mm", "qy_rel_mm", "qz_rel_mm", "qw_rel_mm",
+    "elapsed_time_s",
+]
+
+# Values of one pair of boards (relative pose, distance, error), stored per pair in pair_measurements
+PAIR_VALUES = RESULT_COLUMNS[6:15]
+
+# Gli export Halcon (e le colonne per coppia del formato a N board) non hanno il suffisso _mm sui quaternioni
+COLUMN_ALIASES = {"qx_rel": "qx_rel_mm", "qy_rel": "qy_rel_mm", "qz_rel": "qz_rel_mm", "qw_rel": "qw_rel_mm"}
+
+# Columns of the N-board results (main.ResultSchema): M<b>_t<axis>_mm and C<i>_C<j>_<value>
+BOARD_COLUMN = re.compile(r"M(?P<board>\d+)_t(?P<axis>[xyz])_mm$")
+PAIR_COLUMN = re.compile(r"C(?P<i>\d+)_C(?P<j>\d+)_(?P<value>\w+)$")
+
+# Nome convenzionale dei file di risultati: set_<shift>_<system>.csv
+RUN_FILE = re.compile(r"set_(?P<shift>[+-]?\d+)_(?P<system>\w+)\.(csv|npy)$")
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    run_id           INTEGER PRIMARY KEY,
+    started_at       TEXT NOT NULL,        -- ISO 8601 UTC
+    system           TEXT NOT NULL,        -- detector profile (charuco, charuco_sub, ...) or halcon
+    shift            TEXT,                 -- from set_<shift>_<system>.csv, NULL if unknown
+    source           TEXT,                 -- input_dir of the run or imported file
+    output_csv       TEXT,
+    detector_profile TEXT,
+    calib_sha1       TEXT,
+    settings         TEXT,                 -- settings.json of the run (JSON)
+    n_images         INTEGER NOT NULL DEFAULT 0,
+    n_boards         INTEGER NOT NULL DEFAULT 2
+);
+CREATE INDEX IF NOT EXISTS runs_system_shift ON runs (system, shift, started_at);
+CREATE INDEX IF NOT EXISTS runs_started_at ON runs (started_at);
+
+CREATE TABLE IF NOT EXISTS measurements (
+    run_id     INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    image_name TEXT NOT NULL,
+    {", ".join(f"{c} REAL" for c in RESULT_COLUMNS)}
+);
+CREATE INDEX IF NOT EXISTS measurements_run ON measurements (run_id, image_name);
+CREATE INDEX IF NOT EXISTS measurements_image ON measurements (image_name);
+
+-- every board and every pair of boards (i < j) of N-board runs; C1/C2 are also in measurements
+CREATE TABLE IF NOT EXISTS board_positions (
+    run_id     INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    image_name TEXT NOT NULL,
+    board      INTEGER NOT NULL,
+    tx_mm REAL, ty_mm REAL, tz_mm REAL
+);
+CREATE INDEX IF NOT EXISTS board_positions_run ON board_positions (run_id, board);
+
+CREATE TABLE IF NOT EXISTS pair_measurements (
+    run_id     INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    image_name TEXT NOT NULL,
+    pair_i     INTEGER NOT NULL,
+    pair_j     INTEGER NOT NULL,
+    {", ".join(f"{c} REAL" for c in PAIR_VALUES)}
+);
+CREATE INDEX IF NOT EXISTS pair_measurements_run ON pair_measurements (run_id, pair_i, pair_j);
+"""
+
+# Registries created before the N-board tables: their C1/C2 rows become board and pair rows
+MIGRATE_N_BOARDS = f"""
+ALTER TABLE runs ADD COLUMN n_boards INTEGER NOT NULL DEFAULT 2;
+INSERT INTO board_positions (run_id, image_name, board, tx_mm, ty_mm, tz_mm)
+    SELECT run_id, image_name, 1, M1_tx_mm, M1_ty_mm, M1_tz_mm FROM measurements
+    UNION ALL SELECT run_id, image_name, 2, M2_tx_mm, M2_ty_mm, M2_tz_mm FROM measurements;
+INSERT INTO pair_measurements (run_id, image_name, pair_i, pair_j, {", ".join(PAIR_VALUES)})
+    SELECT run_id, image_name, 1, 2, {", ".join(PAIR_VALUES)} FROM measurements;
+"""
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def parse_run_name(path):
+    """
+    (shift, system) from a set_<shift>_<system>.csv path, or (None, None).
+    """
+    m = RUN_FILE.search(os.path.basename(path or ""))
+    return (m["shift"], m["system"]) if m else (None, None)
+
+
+def row_layout(header):
+    """
+    Where the registry finds its values in the rows of a results file with this header: the
+    C1/C2 schema (main.CSV_HEADER, Halcon exports) or the N-board one (main.ResultSchema).
+    Returns (measurement, boards, pairs): the indices of RESULT_COLUMNS (boards 1-2 and pair C1_C2),
+    [(board, [x, y, z])] and [((i, j), [indices of PAIR_VALUES])]. Other columns are ignored.
+    """
+    boards, pairs = {}, {}
+    for k, column in enumerate(header):
+        m = BOARD_COLUMN.match(column)
+        if m:
+            boards.setdefault(int(m["board"]), {})[m["axis"]] = k
+            continue
+        m = PAIR_COLUMN.match(column)
+        pair, value = ((int(m["i"]), int(m["j"])), m["value"]) if m else ((1, 2), column)
+        value = COLUMN_ALIASES.get(value, value)
+        if value in PAIR_VALUES:
+            pairs.setdefault(pair, {})[value] = k
+    try:
+        boards = [(b, [axes[a] for a in "xyz"]) for b, axes in sorted(boards.items())]
+        pairs = [(pair, [values[v] for v in PAIR_VALUES]) for pair, values in sorted(pairs.items())]
+        positions = dict(boards)
+        measurement = positions[1] + positions[2] + dict(pairs)[(1, 2)] + [header.index("elapsed_time_s")]
+    except (KeyError, ValueError) as e:
+        raise ValueError(f"Colonne dei risultati incomplete (manca {e})") from None
+    return measurement, boards, pairs
+
+
+# Layout of rows [image_name, *RESULT_COLUMNS]
+LEGACY_LAYOUT = row_layout(["image_name"] + RESULT_COLUMNS)
+
+
+class RunRegistry:
+    """
+    SQLite database of every measurement run: one row per run in `runs` (system, shift,
+    settings, detector profile, hash of the calibration file) and one row per image in
+    `measurements` (boards C1/C2), plus one per board in `board_positions` and one per pair of
+    boards in `pair_measurements`. Lookups by system/shift/date, by run, pair or image_name are indexed.
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")  # queries do not block a run that is writing
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(runs)")}
+        self.conn.executescript(SCHEMA)
+        if columns and "n_boards" not in columns:
+            self.conn.executescript(f"BEGIN;{MIGRATE_N_BOARDS}COMMIT;")
+
+    def close(self):
+        self.conn.close()
+
+    def start_run(self, system, shift=None, source=None, output_csv=None, settings=None,
+                  detector_profile=None, calib_sha1=None, started_at=None, n_boards=2):
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO runs (started_at, system, shift, source, output_csv, detector_profile, calib_sha1, "
+                "settings, n_boards) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (started_at or _now(), system, shift, source, output_csv, detector_profile, calib_sha1,
+                 json.dumps(settings, sort_keys=True, default=str) if settings is not None else None, n_boards)
+            )
+        return cur.lastrowid
+
+    def add_rows(self, run_id, rows, layout=LEGACY_LAYOUT):
+        """
+        Stores result rows (numbers may be strings, NaN is stored as NULL) laid out as row_layout
+        says, by default [image_name, *RESULT_COLUMNS, ...]: the C1/C2 values in measurements,
+        every board in board_positions and every pair in pair_measurements.
+        """
+        measurement, boards, pairs = layout
+        values = [(run_id, row[0], *(float(row[k]) for k in measurement)) for row in rows]
+        board_values = [(run_id, row[0], b, *(float(row[k]) for k in idx)) for row in rows for b, idx in boards]
+        pair_values = [(run_id, row[0], *pair, *(float(row[k]) for k in idx)) for row in rows for pair, idx in pairs]
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO measurements (run_id, image_name, {', '.join(RESULT_COLUMNS)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(RESULT_COLUMNS))})", values
+            )
+            self.conn.executemany(
+                "INSERT INTO board_positions (run_id, image_name, board, tx_mm, ty_mm, tz_mm) "
+                "VALUES (?, ?, ?, ?, ?, ?)", board_values
+            )
+            self.conn.executemany(
+                f"INSERT INTO pair_measurements (run_id, image_name, pair_i, pair_j, {', '.join(PAIR_VALUES)}) "
+                f"VALUES (?, ?, ?, ?, {', '.join('?' * len(PAIR_VALUES))})", pair_values
+            )
+            self.conn.execute("UPDATE runs SET n_images = n_images + ? WHERE run_id = ?", (len(values), run_id))
+
+    def import_csv(self, csv_path, system=None, shift=None, started_at=None):
+        """
+        Registers an existing results CSV (e.g. a Halcon export, or an N-board run) as a run. system
+        and shift default to the set_<shift>_<system>.csv name, started_at to the file modification time.
+        """
+        name_shift, name_system = parse_run_name(csv_path)
+        system, shift = system or name_system, shift or name_shift
+        if system is None:
+            raise ValueError(f"{csv_path}: sistema non indicato e nome non nel formato set_<shift>_<system>.csv")
+        with open(csv_path, newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            if "image_name" not in header:
+                raise ValueError(f"{csv_path}: colonna image_name mancante")
+            try:
+                # image_name first, as in the rows of main.py
+                layout = row_layout(["image_name"] + header)
+            except ValueError as e:
+                raise ValueError(f"{csv_path}: {e}") from None
+            name_idx = header.index("image_name")
+            rows = [[row[name_idx]] + row for row in reader if row]
+        if started_at is None:
+            started_at = datetime.fromtimestamp(os.path.getmtime(csv_path), timezone.utc).isoformat(timespec="seconds")
+        run_id = self.start_run(system, shift, source=os.path.abspath(csv_path), started_at=started_at,
+                                n_boards=len(layout[1]))
+        self.add_rows(run_id, rows, layout)
+        return run_id, len(rows)
+
+    def _where(self, system=None, shift=None, since=None, until=None, run_ids=None):
+        clauses, params = [], []
+        for clause, value in (("r.system = ?", system), ("r.shift = ?", shift),
+                              ("r.started_at >= ?", since), ("r.started_at < ?", until)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        if run_ids:
+            clauses.append(f"r.run_id IN ({', '.join('?' * len(run_ids))})")
+            params.extend(run_ids)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def runs(self, **filters):
+        """
+        Runs matching the filters (system, shift, since, until, run_ids), newest first, as dicts.
+        """
+        where, params = self._where(**filters)
+        cur = self.conn.execute(
+            f"SELECT r.run_id, r.started_at, r.system, r.shift, r.n_images, r.n_boards, r.detector_profile, "
+            f"r.calib_sha1, r.source "
+            f"FROM runs r{where} ORDER BY r.started_at DESC, r.run_id DESC", params
+        )
+        names = [d[0] for d in cur.description]
+        return [dict(zip(names, row)) for row in cur]
+
+    def _source(self, column, pair=None, **filters):
+        """
+        FROM/WHERE clause and parameters over the measurements of the matching runs, or over
+        the rows of one pair of boards (i, j) in pair_measurements.
+        """
+        where, params = self._where(**filters)
+        if pair is None:
+            if column not in RESULT_COLUMNS:
+                raise ValueError(f"Colonna sconosciuta '{column}'")
+            return f"FROM runs r JOIN measurements m ON m.run_id = r.run_id{where}", params
+        if column not in PAIR_VALUES:
+            raise ValueError(f"Colonna sconosciuta per una coppia '{column}'")
+        where += (" AND " if where else " WHERE ") + "m.pair_i = ? AND m.pair_j = ?"
+        return f"FROM runs r JOIN pair_measurements m ON m.run_id = r.run_id{where}", params + list(pair)
+
+    def column_stats(self, column, absolute=False, pair=None, **filters):
+        """
+        n, mean, std (sample, two-pass), min, max of one result column over the measurements of
+        the matching runs (of the pair of boards (i, j) if given), aggregated by SQLite over the
+        index (no row leaves the database). NULL values (e.g. error_mm without a nominal distance) are skipped.
+        """
+        value = f"ABS(m.{column})" if absolute else f"m.{column}"
+        source, params = self._source(column, pair, **filters)
+        n, mean, lo, hi, n_runs = self.conn.execute(
+            f"SELECT COUNT({value}), AVG({value}), MIN({value}), MAX({value}), COUNT(DISTINCT r.run_id) {source}",
+            params
+        ).fetchone()
+        std = None
+        if n and n > 1:
+            # second pass around the mean: AVG(x*x) - AVG(x)^2 cancels out for ~130 mm values with µm spread
+            sq_dev, = self.conn.execute(
+                f"SELECT SUM(({value} - ?) * ({value} - ?)) {source}", [mean, mean, *params]
+            ).fetchone()
+            std = (sq_dev / (n - 1)) ** 0.5
+        return {"n": n, "runs": n_runs, "mean": mean, "std": std, "min": lo, "max": hi}
+
+    def measurements(self, run_id, columns=None, pair=None):
+        """
+        (image_name, *columns) of one run in insertion order, of the pair of boards (i, j) if given.
+        """
+        known = RESULT_COLUMNS if pair is None else PAIR_VALUES
+        columns = columns or known
+        unknown = [c for c in columns if c not in known]
+        if unknown:
+            raise ValueError(f"Colonne sconosciute: {', '.join(unknown)}")
+        if pair is None:
+            return self.conn.execute(
+                f"SELECT image_name, {', '.join(columns)} FROM measurements WHERE run_id = ? ORDER BY rowid", (run_id,)
+            ).fetchall()
+        return self.conn.execute(
+            f"SELECT image_name, {', '.join(columns)} FROM pair_measurements "
+            f"WHERE run_id = ? AND pair_i = ? AND pair_j = ? ORDER BY rowid", (run_id, *pair)
+        ).fetchall()
+
+
+class RegistryWriter:
+    """
+    csv.writer-like sink of a main.py run: rows (laid out as row_layout says) are buffered and
+    stored in chunks of chunk_rows (one transaction each), like ColumnarWriter writes its chunks.
+    """
+    def __init__(self, registry, run_id, layout=LEGACY_LAYOUT, chunk_rows=256):
+        self.registry = registry
+        self.run_id = run_id
+        self.layout = layout
+        self.chunk_rows = chunk_rows
+        self._rows = []
+
+    def writerow(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if self._rows:
+            self.registry.add_rows(self.run_id, self._rows, self.layout)
+            self._rows = []
+
+    def close(self):
+        self.flush()
+        self.registry.close()
+
+
+def open_run_writer(args, header=None):
+    """
+    RegistryWriter of a new run in the "run_registry" database of settings.json, or None
+    when no registry is configured. header: columns of the result rows (default the C1/C2
+    layout of main.CSV_HEADER). system = detector profile, shift from the output CSV name.
+    """
+    db_path = getattr(args, "run_registry", None)
+    if not db_path:
+        return None
+    layout = row_layout(header) if header is not None else LEGACY_LAYOUT
+    registry = RunRegistry(db_path)
+    profile = getattr(args, "detector_profile", None)
+    shift, _ = parse_run_name(args.output_csv)
+    source = str(args.video_source) if getattr(args, "source", "directory") == "video" else args.input_dir
+    run_id = registry.start_run(
+        system=profile or "charuco", shift=shift, source=source, output_csv=os.path.abspath(args.output_csv),
+        settings=vars(args), detector_profile=profile, calib_sha1=file_hash(args.calib_file),
+        n_boards=len(layout[1]),
+    )
+    return RegistryWriter(registry, run_id, layout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registro SQLite delle run di misura.")
+    parser.add_argument("--db", help="database (default: run_registry di settings.json)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", help="registra file CSV esistenti (es. export Halcon)")
+    p_import.add_argument("csv", nargs="+")
+    p_import.add_argument("--system", help="default: dal nome set_<shift>_<system>.csv")
+    p_import.add_argument("--shift")
+
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument("--system")
+    filters.add_argument("--shift")
+    filters.add_argument("--since", help="data ISO (inclusa), es. 2026-10-01")
+    filters.add_argument("--until", help="data ISO (esclusa)")
+    filters.add_argument("--run", type=int, nargs="+", dest="run_ids")
+
+    sub.add_parser("runs", parents=[filters], help="elenco delle run")
+    p_stats = sub.add_parser("stats", parents=[filters], help="statistiche di una colonna")
+    p_stats.add_argument("column", choices=RESULT_COLUMNS)
+    p_stats.add_argument("--abs", action="store_true", help="statistiche del valore assoluto")
+    p_stats.add_argument("--pair", type=int, nargs=2, metavar=("I", "J"),
+                         help="coppia di board C<I>_C<J> (run a N board; default: C1_C2)")
+    cli = parser.parse_args()
+
+    db_path = cli.db
+    if db_path is None:
+        from utils import parse_args_from_json
+        db_path = getattr(parse_args_from_json(), "run_registry", None)
+        if not db_path:
+            parser.error("nessun database: usare --db o impostare run_registry in settings.json")
+    registry = RunRegistry(db_path)
+
+    if cli.command == "import":
+        for path in cli.csv:
+            run_id, n = registry.import_csv(path, cli.system, cli.shift)
+            print(f"[INFO] {path} → run {run_id} ({n} righe)")
+        return
+
+    filters = {k: getattr(cli, k) for k in ("system", "shift", "since", "until", "run_ids")}
+    if cli.command == "runs":
+        print(f"{'run':>5}  {'started_at (UTC)':<26}{'system':<14}{'shift':>6}{'images':>8}{'boards':>8}  source")
+        for r in registry.runs(**filters):
+            print(f"{r['run_id']:>5}  {r['started_at']:<26}{r['system']:<14}{r['shift'] or '-':>6}{r['n_images']:>8}"
+                  f"{r['n_boards']:>8}  {r['source']}")
+    else:
+        pair = tuple(cli.pair) if cli.pair else None
+        if pair and cli.column not in PAIR_VALUES:
+            parser.error(f"--pair vale solo per {', '.join(PAIR_VALUES)}")
+        s = registry.column_stats(cli.column, absolute=cli.abs, pair=pair, **filters)
+        if not s["n"]:
+            print("[INFO] Nessuna misura con questi filtri")
+            return
+        std = f"{s['std']:.4f}" if s["std"] is not None else "-"
+        label = f"C{pair[0]}_C{pair[1]}_{cli.column}" if pair else cli.column
+        print(f"{label}: n={s['n']} ({s['runs']} run) mean={s['mean']:.4f} std={std} min={s['min']:.4f} max={s['max']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import os
+import cv2
+import json
+import time
+import queue
+import argparse
+import socketserver
+import numpy as np
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from utils import parse_args_from_json
+from frame_loader import read_gray
+from timing import StageTimer, STAGES
+from main import RunContext, measure_frame
+
+
+class MeasurementService:
+    """
+    Keeps calibration, boards and detector warm between requests. A pool of `contexts`
+    RunContexts bounds how many images are detected at the same time; every request
+    checks one out, so detectors are never shared between threads. Requests are unrelated
+    images: ROI tracking and pose warm start are disabled, so no request seeds the next one.
+    """
+    def __init__(self, args, contexts=2):
+        stateful = [key for key, off in (("tracking", False), ("pose_warm_start", "none"))
+                    if getattr(args, key, off) not in (off, None)]
+        if stateful:
+            print(f"[WARN] {', '.join(stateful)} disattivati nel servizio: le richieste sono immagini indipendenti")
+        args = SimpleNamespace(**{**vars(args), "tracking": False, "pose_warm_start": "none"})
+        self.contexts = queue.Queue()
+        for _ in range(max(int(contexts), 1)):
+            ctx = RunContext(args)
+            # first call of the detector (lazy OpenCV initialisation) out of the first request
+            ctx.engine.detect_markers(np.zeros((64, 64), dtype=np.uint8))
+            self.contexts.put(ctx)
+        # result columns of the boards ("n_boards"), the same in every context
+        self.schema = ctx.schema
+        self.n_contexts = self.contexts.qsize()
+
+    def measure(self, img_gray=None, img_path=None, img_bytes=None, name=None):
+        """
+        Measures one image, given decoded (img_gray), as a file path or as encoded bytes.
+        Returns a dict with ok, the CSV fields (schema.header) or a warning, and per-stage timings (s).
+        """
+        start_t = time.time()
+        timer = StageTimer()
+        if img_path is not None:
+            name = name or os.path.basename(img_path)
+            with timer.stage("read"):
+                img_gray = read_gray(img_path)
+        elif img_bytes is not None:
+            with timer.stage("read"):
+                img_gray = cv2.imdecode(np.frombuffer(img_bytes, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+            if img_gray is None:
+                raise ValueError("Immagine non decodificabile")
+
+        ctx = self.contexts.get()
+        try:
+            pose, warning = measure_frame(img_gray, ctx, timer)
+        finally:
+            self.contexts.put(ctx)
+
+        result = {"image_name": name, "ok": pose is not None}
+        if pose is None:
+            result["warning"] = warning
+        else:
+            with timer.stage("math"):
+                poses = self.schema.compute_poses([pose])
+            row = self.schema.build_rows([name], poses, [time.time() - start_t])[0]
+            result.update(zip(self.schema.header, row))
+            result["elapsed_time_s"] = float(result["elapsed_time_s"])
+        result["timings"] = {s: timer.wall[s] for s in STAGES if s != "write"}
+        result["timings"]["total"] = time.time() - start_t
+        return result
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """
+    GET  /health               → {"status": "ok", "contexts": N}
+    POST /measure              → JSON body {"path": "...", "name": "..."} (image on the service machine)
+                                 or the encoded image itself (TIFF/PNG/..., name in ?name=)
+    Answers 200 with the measurement, 422 if the boards were not found, 400 on bad requests,
+    500 if the measurement itself fails.
+    """
+    protocol_version = "HTTP/1.1"  # keep-alive: a client can send many requests on one connection
+    service = None
+    verbose = False
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/health":
+            self._send_json(200, {"status": "ok", "contexts": self.service.n_contexts})
+        else:
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if url.path != "/measure":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        try:
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                request = json.loads(body)
+                result = self.service.measure(img_path=request["path"], name=request.get("name"))
+            else:
+                name = parse_qs(url.query).get("name", ["image"])[0]
+                result = self.service.measure(img_bytes=body, name=name)
+        except (KeyError, ValueError, IOError) as e:
+            self._send_json(400, {"ok": False, "error": str(e)})
+            return
+        except Exception as e:
+            # e.g. cv2.error from the detector: always answer, the connection is kept alive
+            self._send_json(500, {"ok": False, "error": f"{type(e).__name__}: {e}"})
+            return
+        self._send_json(200 if result["ok"] else 422, result)
+
+    def address_string(self):
+        # Unix socket clients have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service, host="127.0.0.1", port=8765, unix_path=None, verbose=False):
+    """
+    HTTP server of the service, one thread per connection: on localhost (host, port),
+    or on the Unix socket unix_path if given.
+    """
+    handler = type("Handler", (ServiceHandler,), {"service": service, "verbose": verbose})
+    if unix_path is None:
+        return ThreadingHTTPServer((host, port), handler)
+    if os.path.exists(unix_path):
+        os.remove(unix_path)  # stale socket of a previous run
+    return ThreadingUnixHTTPServer(unix_path, handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident measurement service (HTTP on localhost or Unix socket).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--contexts", type=int, default=2, help="images detected concurrently")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    cli = parser.parse_args()
+
+    args = parse_args_from_json()
+    start_t = time.time()
+    service = MeasurementService(args, contexts=cli.contexts)
+    server = make_server(service, cli.host, cli.port, cli.unix, cli.verbose)
+    where = cli.unix or f"http://{cli.host}:{cli.port}"
+    print(f"[INFO] Servizio pronto su {where} ({service.n_contexts} contesti, avvio {time.time() - start_t:.2f} s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if cli.unix and os.path.exists(cli.unix):
+            os.remove(cli.unix)
+
+
+if __name__ == "__main__":
+    main()
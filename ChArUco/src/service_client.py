@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import socket
+import argparse
+import http.client
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    HTTPConnection over a Unix socket (service.py --unix).
+    """
+    def __init__(self, unix_path, timeout=30):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = unix_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+def connect(host="127.0.0.1", port=8765, unix_path=None, timeout=30):
+    if unix_path:
+        return UnixHTTPConnection(unix_path, timeout)
+    return http.client.HTTPConnection(host, port, timeout=timeout)
+
+
+def measure(conn, img_path, upload=False):
+    """
+    Asks the service to measure img_path: by path (the service reads the file) or, with
+    upload=True, sending the encoded image. Returns (HTTP status, response dict).
+    """
+    if upload:
+        with open(img_path, "rb") as f:
+            body = f.read()
+        name = os.path.basename(img_path)
+        conn.request("POST", f"/measure?name={quote(name)}", body, {"Content-Type": "application/octet-stream"})
+    else:
+        body = json.dumps({"path": os.path.abspath(img_path)})
+        conn.request("POST", "/measure", body, {"Content-Type": "application/json"})
+    response = conn.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def format_distances(result):
+    """
+    Distances (and errors) of every board pair of a measurement: "distance_mm" with 2 boards,
+    "C<i>_C<j>_distance_mm" with more ("n_boards" of the service).
+    """
+    parts = []
+    for column in (c for c in result if c.endswith("distance_mm")):
+        prefix = column[:-len("distance_mm")]
+        parts.append(f"{prefix}Δ= {result[column]:.4f} mm (err={result[prefix + 'error_mm']:+.4f} mm)")
+    return ", ".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test client of the measurement service.")
+    parser.add_argument("images", nargs="+")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="Unix socket of the service")
+    parser.add_argument("--upload", action="store_true", help="send the image bytes instead of the path")
+    parser.add_argument("--concurrency", type=int, default=1, help="parallel connections")
+    cli = parser.parse_args()
+
+    def run(img_paths):
+        # one keep-alive connection per client thread
+        conn = connect(cli.host, cli.port, cli.unix)
+        out = []
+        for img_path in img_paths:
+            start_t = time.time()
+            status, result = measure(conn, img_path, cli.upload)
+            out.append((img_path, status, result, time.time() - start_t))
+        conn.close()
+        return out
+
+    chunks = [cli.images[i::cli.concurrency] for i in range(cli.concurrency)]
+    start_t = time.time()
+    with ThreadPoolExecutor(cli.concurrency) as executor:
+        results = [r for chunk in executor.map(run, chunks) for r in chunk]
+    for img_path, status, result, rtt in results:
+        if result.get("ok"):
+            print(f"[{status}] {result['image_name']} → {format_distances(result)} "
+                  f"(servizio {result['timings']['total'] * 1000:.1f} ms, round trip {rtt * 1000:.1f} ms)")
+        else:
+            print(f"[{status}] {img_path}: {result.get('warning') or result.get('error')}")
+    print(f"[DONE] {len(results)} richieste in {time.time() - start_t:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import os
+import cv2
+import csv
+import argparse
+import multiprocessing as mp
+import numpy as np
+
+from utils import CameraModel, parse_args_from_json
+from detect_charuco import create_charuco_boards
+from main import compute_relative_poses, build_csv_rows, CSV_HEADER, EXPECTED_DISTANCE_M, BOARD_CENTER_OFFSET_M
+
+# Resolution of our Basler camera
+IMAGE_SIZE = (2064, 1544)
+
+# Max distance (texels) between an inner chessboard corner of a texture and its exact position
+TEXTURE_CORNER_TOL = 0.01
+
+# Per-process renderer of the generator workers (filled once by _init_worker)
+_WORKER_RENDERER = None
+
+
+def rotation_xyz(rx, ry, rz):
+    """
+    Rotation matrix R = Rz @ Ry @ Rx from angles in radians.
+    """
+    cx, sx, cy, sy, cz, sz = np.cos(rx), np.sin(rx), np.cos(ry), np.sin(ry), np.cos(rz), np.sin(rz)
+    Rx = np.array([[1, 0, 0], [0, cx, -sx], [0, sx, cx]])
+    Ry = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+    Rz = np.array([[cz, -sz, 0], [sz, cz, 0], [0, 0, 1]])
+    return Rz @ Ry @ Rx
+
+
+def sample_plate_pose(rng, z_range, max_offset, max_tilt_deg, max_roll_deg, shift):
+    """
+    Random 4x4 pose (camera frame) of the plate centre: distance in z_range, lateral offset
+    up to max_offset, tilt about x/y up to max_tilt_deg, rotation about z up to max_roll_deg.
+    shift (x, y, z in m) is added to the translation, as the ±10 mm sets.
+    """
+    tilt = np.deg2rad(max_tilt_deg)
+    roll = np.deg2rad(max_roll_deg)
+    T = np.eye(4)
+    T[:3, :3] = rotation_xyz(rng.uniform(-tilt, tilt), rng.uniform(-tilt, tilt), rng.uniform(-roll, roll))
+    T[:3, 3] = [rng.uniform(-max_offset, max_offset), rng.uniform(-max_offset, max_offset), rng.uniform(*z_range)]
+    T[:3, 3] += shift
+    return T
+
+
+def board_poses_on_plate(T_plate):
+    """
+    Poses of the origins (corner) of C1 and C2 placed diagonally on the plate, with
+    their centres EXPECTED_DISTANCE_M apart and the same orientation as the plate.
+    """
+    half = EXPECTED_DISTANCE_M / np.sqrt(2.0) / 2.0
+    poses = []
+    for sign in (-1.0, 1.0):
+        T_local = np.eye(4)
+        T_local[:3, 3] = np.array([sign * half, sign * half, 0.0]) - BOARD_CENTER_OFFSET_M
+        poses.append(T_plate @ T_local)
+    return poses
+
+
+class SyntheticRenderer:
+    """
+    Renders the two CharucoBoards at known poses through a real camera model (distortion included).
+    Each output pixel is traced back to the board plane: the ideal (undistorted) ray of every pixel
+    is computed once, then per board only the plane homography changes.
+    """
+    def __init__(self, camera_model, board1, board2, board_physical_size, image_size=IMAGE_SIZE,
+                 nominal_distance=0.92, background=140, black=25, white=230):
+        self.camera_model = camera_model
+        self.boards = (board1, board2)
+        self.board_physical_size = board_physical_size
+        self.image_size = image_size
+        self.background, self.black, self.white = background, black, white
+
+        # texture of the boards at about one texel per image pixel at the nominal distance; the side is a
+        # multiple of the squares, otherwise generateImage snaps each square to whole texels and the
+        # rendered board no longer has the size of the ground truth
+        squares = int(np.lcm(*board1.getChessboardSize()))
+        ppm = camera_model.camera_matrix[0, 0] / nominal_distance
+        side = squares * max(1, int(round(board_physical_size * ppm / squares)))
+        self.ppm = side / board_physical_size
+        self.textures = [
+            (black + (white - black) * (b.generateImage((side, side), marginSize=0) / 255.0)).astype(np.float32)
+            for b in self.boards
+        ]
+        for board, texture in zip(self.boards, self.textures):
+            error = self.texture_corner_error(board, texture)
+            if error > TEXTURE_CORNER_TOL:
+                raise ValueError(f"Texture della board non esatta: angoli spostati di {error:.3f} texel")
+
+        # normalized ideal coordinates (x, y) of every pixel centre, shape (H, W, 2)
+        w, h = image_size
+        u, v = np.meshgrid(np.arange(w, dtype=np.float64), np.arange(h, dtype=np.float64))
+        pixels = np.stack([u.ravel(), v.ravel()], axis=1).reshape(-1, 1, 2)
+        criteria = (cv2.TERM_CRITERIA_COUNT | cv2.TERM_CRITERIA_EPS, 50, 1e-10)
+        rays = cv2.undistortPointsIter(pixels, camera_model.camera_matrix, camera_model.dist_coeffs,
+                                       None, None, criteria)
+        self.rays = rays.reshape(h, w, 2)
+
+    def texture_corner_error(self, board, texture):
+        """
+        Max distance (texels) between the inner chessboard corners found in texture (cornerSubPix)
+        and where the ground truth puts them (board corner * ppm, texel centres at i + 0.5).
+        """
+        expected = (board.getChessboardCorners()[:, :2] * self.ppm - 0.5).astype(np.float32)
+        found = (expected + 0.3).reshape(-1, 1, 2)
+        criteria = (cv2.TERM_CRITERIA_COUNT | cv2.TERM_CRITERIA_EPS, 100, 1e-6)
+        cv2.cornerSubPix(texture, found, (3, 3), (-1, -1), criteria)
+        return float(np.abs(found.reshape(-1, 2) - expected).max())
+
+    def _board_roi(self, T_board):
+        """
+        Pixel bounding box (x0, y0, x1, y1) of the board outline, with a margin, clipped to the image.
+        """
+        s = self.board_physical_size
+        outline = np.array([[0, 0, 0], [s, 0, 0], [s, s, 0], [0, s, 0]], dtype=np.float64)
+        rvec, _ = cv2.Rodrigues(T_board[:3, :3])
+        projected, _ = cv2.projectPoints(outline, rvec, T_board[:3, 3], self.camera_model.camera_matrix,
+                                         self.camera_model.dist_coeffs)
+        projected = projected.reshape(-1, 2)
+        margin = 8
+        w, h = self.image_size
+        x0, y0 = np.maximum(np.floor(projected.min(axis=0)).astype(int) - margin, 0)
+        x1, y1 = np.minimum(np.ceil(projected.max(axis=0)).astype(int) + margin, [w, h])
+        return x0, y0, x1, y1
+
+    def _draw_board(self, img, texture, T_board):
+        x0, y0, x1, y1 = self._board_roi(T_board)
+        if x1 <= x0 or y1 <= y0:
+            return
+        # plane → normalized image homography [r1 r2 t], inverted to trace pixels back to the board
+        H_inv = np.linalg.inv(np.column_stack([T_board[:3, 0], T_board[:3, 1], T_board[:3, 3]]))
+        rays = self.rays[y0:y1, x0:x1]
+        p = rays[..., 0, None] * H_inv[:, 0] + rays[..., 1, None] * H_inv[:, 1] + H_inv[:, 2]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # texel i covers [i, i+1) / ppm on the board → pixel centre at i + 0.5
+            map_x = (p[..., 0] / p[..., 2] * self.ppm - 0.5).astype(np.float32)
+            map_y = (p[..., 1] / p[..., 2] * self.ppm - 0.5).astype(np.float32)
+        behind = p[..., 2] <= 0
+        map_x[behind] = -1e6
+        map_y[behind] = -1e6
+        # outside the texture the plate is left untouched (BORDER_TRANSPARENT keeps dst)
+        patch = img[y0:y1, x0:x1].copy()
+        cv2.remap(texture, map_x, map_y, cv2.INTER_LINEAR, dst=patch, borderMode=cv2.BORDER_TRANSPARENT)
+        img[y0:y1, x0:x1] = patch
+
+    def render(self, T_board1, T_board2, rng, blur_sigma=1.0, noise_sigma=2.0):
+        """
+        8-bit gray image of both boards at the given 4x4 poses (board origin in camera frame),
+        with Gaussian optical blur (sigma in px) and additive Gaussian noise (sigma in gray levels).
+        """
+        w, h = self.image_size
+        img = np.full((h, w), self.background, dtype=np.float32)
+        for texture, T_board in zip(self.textures, (T_board1, T_board2)):
+            self._draw_board(img, texture, T_board)
+        if blur_sigma > 0:
+            img = cv2.GaussianBlur(img, (0, 0), blur_sigma)
+        if noise_sigma > 0:
+            img += rng.normal(0.0, noise_sigma, img.shape).astype(np.float32)
+        return np.clip(np.round(img), 0, 255).astype(np.uint8)
+
+
+def build_renderer(config):
+    """
+    SyntheticRenderer from plain values (board_size, marker_length_ratio, board_physical_size,
+    calib_file, image_size, nominal_distance): boards and camera model are built here.
+    """
+    board1, board2, _, _ = create_charuco_boards(
+        (config["board_size"], config["board_size"]), config["board_physical_size"], config["marker_length_ratio"]
+    )
+    camera_model = CameraModel.from_yaml(config["calib_file"])
+    return SyntheticRenderer(camera_model, board1, board2, config["board_physical_size"], config["image_size"],
+                             config["nominal_distance"])
+
+
+def _init_worker(config, options):
+    """
+    Pool initializer: every worker builds its own renderer. config and options hold only
+    plain values (CharucoBoard objects are not picklable under "spawn"/"forkserver").
+    """
+    global _WORKER_RENDERER
+    cv2.setNumThreads(1)
+    _WORKER_RENDERER = (build_renderer(config), options)
+
+
+def _render_frame(task):
+    """
+    Pool task: samples the plate pose of frame idx (own seed → same dataset for any number
+    of workers), renders it and writes the TIFF. Returns (img_name, T_board1, T_board2).
+    """
+    idx, seed, img_path = task
+    renderer, opt = _WORKER_RENDERER
+    rng = np.random.default_rng([seed, idx])
+    T_plate = sample_plate_pose(rng, opt["z_range"], opt["max_offset"], opt["max_tilt_deg"],
+                                opt["max_roll_deg"], opt["shift"])
+    T_board1, T_board2 = board_poses_on_plate(T_plate)
+    img = renderer.render(T_board1, T_board2, rng, opt["blur_sigma"], opt["noise_sigma"])
+    if not cv2.imwrite(img_path, img):
+        raise IOError(f"Impossibile scrivere {img_path}")
+    return os.path.basename(img_path), T_board1, T_board2
+
+
+def ground_truth_rows(img_names, T_boards1, T_boards2):
+    """
+    Ground-truth rows in the results schema (CSV_HEADER), from the true board poses.
+    elapsed_time_s is 0.
+    """
+    rvecs1 = np.array([cv2.Rodrigues(T[:3, :3])[0].ravel() for T in T_boards1])
+    rvecs2 = np.array([cv2.Rodrigues(T[:3, :3])[0].ravel() for T in T_boards2])
+    tvecs1 = np.array([T[:3, 3] for T in T_boards1])
+    tvecs2 = np.array([T[:3, 3] for T in T_boards2])
+    poses = compute_relative_poses(rvecs1, tvecs1, rvecs2, tvecs2)
+    return build_csv_rows(img_names, *poses, np.zeros(len(img_names)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic image set of the two ChArUco boards with ground truth.")
+    parser.add_argument("--output-dir", default="../../data/synthetic/0", help="where the TIFF images are written")
+    parser.add_argument("--ground-truth", help="ground-truth CSV (default: <output-dir>_ground_truth.csv)")
+    parser.add_argument("--count", type=int, default=100, help="number of images")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--width", type=int, default=IMAGE_SIZE[0])
+    parser.add_argument("--height", type=int, default=IMAGE_SIZE[1])
+    parser.add_argument("--distance", type=float, nargs=2, default=(0.90, 0.95), metavar=("MIN", "MAX"),
+                        help="camera-plate distance range (m)")
+    parser.add_argument("--max-offset", type=float, default=0.02, help="max lateral offset of the plate (m)")
+    parser.add_argument("--max-tilt", type=float, default=10.0, help="max tilt about x/y (deg)")
+    parser.add_argument("--max-roll", type=float, default=5.0, help="max rotation about the optical axis (deg)")
+    parser.add_argument("--shift-mm", type=float, nargs=3, default=(0.0, 0.0, 0.0), metavar=("X", "Y", "Z"),
+                        help="constant shift of the plate, as the ±10 mm sets")
+    parser.add_argument("--blur", type=float, default=1.0, help="Gaussian blur sigma (px)")
+    parser.add_argument("--noise", type=float, default=2.0, help="Gaussian noise sigma (gray levels)")
+    parser.add_argument("--workers", type=int, default=0, help="processes (0 = all cores)")
+    cli = parser.parse_args()
+
+    # same boards and calibration as the measurement
+    args = parse_args_from_json()
+    config = {
+        "board_size": args.board_size,
+        "marker_length_ratio": args.marker_length_ratio,
+        "board_physical_size": 0.075,  # in meter
+        "calib_file": args.calib_file,
+        "image_size": (cli.width, cli.height),
+        "nominal_distance": float(np.mean(cli.distance)),
+    }
+
+    os.makedirs(cli.output_dir, exist_ok=True)
+    gt_path = cli.ground_truth or os.path.normpath(cli.output_dir) + "_ground_truth.csv"
+    options = {
+        "z_range": tuple(cli.distance),
+        "max_offset": cli.max_offset,
+        "max_tilt_deg": cli.max_tilt,
+        "max_roll_deg": cli.max_roll,
+        "shift": np.array(cli.shift_mm) / 1000.0,
+        "blur_sigma": cli.blur,
+        "noise_sigma": cli.noise,
+    }
+    tasks = [(i, cli.seed, os.path.join(cli.output_dir, f"img_{i:04d}.tiff")) for i in range(cli.count)]
+    workers = cli.workers if cli.workers > 0 else (os.cpu_count() or 1)
+    print(f"[INFO] Genero {cli.count} immagini in {cli.output_dir} (worker: {workers})")
+
+    results = []
+    with mp.Pool(workers, initializer=_init_worker, initargs=(config, options)) as pool:
+        for idx, res in enumerate(pool.imap(_render_frame, tasks, chunksize=max(1, cli.count // (workers * 8))), 1):
+            results.append(res)
+            print(f"[{idx}/{cli.count}] {res[0]}")
+
+    img_names, T_boards1, T_boards2 = zip(*results)
+    with open(gt_path, mode='w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        writer.writerows(ground_truth_rows(img_names, T_boards1, T_boards2))
+    print(f"[DONE] Ground truth saved in: {gt_path}")
+
+
+if __name__ == "__main__":
+    main()
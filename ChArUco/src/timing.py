@@ -0,0 +1,122 @@
+import io
+import time
+import numpy as np
+from contextlib import contextmanager, nullcontext
+
+# Stages of the measurement of one image, in pipeline order
+STAGES = ("read", "detect", "interpolate", "pose", "math", "write")
+
+# Stages reported per image in the optional CSV columns. The CSV write of a row cannot be timed
+# inside the row itself, so "write" only appears in the end-of-run summary.
+CSV_STAGES = ("read", "detect", "interpolate", "pose", "math")
+STAGE_COLUMNS = [f"t_{s}_s" for s in CSV_STAGES] + [f"cpu_{s}_s" for s in CSV_STAGES]
+
+
+class StageTimer:
+    """
+    Wall (perf_counter) and process CPU (process_time) time per stage of one image.
+    A stage entered several times (e.g. pose of C1 and C2) is accumulated.
+    """
+    def __init__(self):
+        self.wall = dict.fromkeys(STAGES, 0.0)
+        self.cpu = dict.fromkeys(STAGES, 0.0)
+
+    @contextmanager
+    def stage(self, name):
+        w0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.wall[name] += time.perf_counter() - w0
+            self.cpu[name] += time.process_time() - c0
+
+    def add(self, name, wall, cpu):
+        self.wall[name] += wall
+        self.cpu[name] += cpu
+
+    def columns(self):
+        """
+        Values of STAGE_COLUMNS for the CSV row.
+        """
+        return [self.wall[s] for s in CSV_STAGES] + [self.cpu[s] for s in CSV_STAGES]
+
+
+def stage(timer, name):
+    """
+    timer.stage(name), or a no-op context when timing is off (timer is None).
+    """
+    return nullcontext() if timer is None else timer.stage(name)
+
+
+class TimingSummary:
+    """
+    Collects the stage times of every image and prints percentiles at the end of the run.
+    """
+    def __init__(self):
+        self.wall = {s: [] for s in STAGES}
+        self.cpu = {s: [] for s in STAGES}
+
+    def add(self, timer):
+        for s in STAGES:
+            self.wall[s].append(timer.wall[s])
+            self.cpu[s].append(timer.cpu[s])
+
+    def report(self):
+        lines = [f"{'stage':<12}{'n':>6}{'mean ms':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}"
+                 f"{'max ms':>10}{'cpu ms':>10}{'share':>8}"]
+        totals = {s: float(np.sum(self.wall[s])) for s in STAGES}
+        grand_total = sum(totals.values()) or 1.0
+        for s in STAGES:
+            if not self.wall[s]:
+                continue
+            w = np.array(self.wall[s]) * 1000.0
+            p50, p90, p99 = np.percentile(w, [50, 90, 99])
+            lines.append(
+                f"{s:<12}{len(w):>6}{w.mean():>10.2f}{p50:>10.2f}{p90:>10.2f}{p99:>10.2f}"
+                f"{w.max():>10.2f}{np.mean(self.cpu[s]) * 1000.0:>10.2f}{totals[s] / grand_total:>8.1%}"
+            )
+        return "\n".join(lines)
+
+
+class ImageProfiler:
+    """
+    Opt-in cProfile of the run: one profile per image, whose top_n hottest functions
+    (by own time) are appended to a text report, and an aggregate of all images
+    saved as .prof file (open it with pstats or snakeviz).
+    """
+    def __init__(self, prof_path, top_n=15):
+        self.prof_path = prof_path
+        self.report_path = prof_path.rsplit(".", 1)[0] + "_per_image.txt"
+        self.top_n = top_n
+        self.stats = None
+        self._profile = None
+        self._report = open(self.report_path, "w")
+
+    def start(self):
+        import cProfile  # only for --profile runs
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def cancel(self):
+        """
+        Stops the current profile without recording it.
+        """
+        self._profile.disable()
+        self._profile = None
+
+    def stop(self, img_name):
+        import pstats
+        self._profile.disable()
+        buf = io.StringIO()
+        pstats.Stats(self._profile, stream=buf).sort_stats("tottime").print_stats(self.top_n)
+        self._report.write(f"===== {img_name} =====\n{buf.getvalue()}\n")
+        if self.stats is None:
+            self.stats = pstats.Stats(self._profile)
+        else:
+            self.stats.add(self._profile)
+        self._profile = None
+
+    def close(self):
+        self._report.close()
+        if self.stats is not None:
+            self.stats.dump_stats(self.prof_path)
@@ -0,0 +1,187 @@
+import os
+import cv2
+import csv
+import glob
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+
+from utils import parse_args_from_json, translation_distances
+from detect_charuco import CharucoEngine, detect_two_charuco
+from main import RunContext, compute_relative_poses, EXPECTED_DISTANCE_M
+
+# Grid of the corner refinement sweep (values of the DetectorParameters fields)
+MAX_ITERATIONS = [30, 100, 1000, 10000]
+MIN_ACCURACY = [0.1, 0.01, 0.001]
+WIN_SIZES = [5, 10, 15]
+
+# Fields read by each refinement method: only SUBPIX (cornerSubPix) uses the window and the
+# termination criteria, NONE and CONTOUR ignore them, so they are swept once
+REFINEMENT_METHODS = {
+    "none": {},
+    "subpix": {
+        "cornerRefinementMaxIterations": MAX_ITERATIONS,
+        "cornerRefinementMinAccuracy": MIN_ACCURACY,
+        "cornerRefinementWinSize": WIN_SIZES,
+    },
+    "contour": {},
+}
+
+
+def refinement_grid():
+    """
+    All the refinement profiles of the sweep: for each method, the product of the values
+    of the fields it reads (REFINEMENT_METHODS), so that no two profiles behave the same.
+    """
+    profiles = []
+    for method, fields in REFINEMENT_METHODS.items():
+        for values in itertools.product(*fields.values()):
+            profiles.append({"cornerRefinementMethod": method, **dict(zip(fields, values))})
+    return profiles
+
+
+def evaluate_profile(profile, images, ctx):
+    """
+    Runs detection with one profile over the preloaded gray images, then the pose math.
+    Returns a dict with per-image detection latency (s) and error_mm statistics.
+    """
+    engine = CharucoEngine([ctx.board1, ctx.board2], ctx.camera_matrix, ctx.dist_coeffs, profile=profile)
+    latencies, poses = [], []
+    for img_gray in images:
+        start_t = time.perf_counter()
+        detected = detect_two_charuco(img_gray, engine, require_both=True)
+        latencies.append(time.perf_counter() - start_t)
+        if len(detected) == 2:
+            pose_dict = {marker_id: (rvec, tvec) for marker_id, rvec, tvec in detected}
+            poses.append((*pose_dict["C1"], *pose_dict["C2"]))
+
+    # pose math of all detected images in one vectorized call
+    errors = []
+    if poses:
+        _, _, T_rel, _ = compute_relative_poses(*(np.array([p[k] for p in poses]) for k in range(4)))
+        errors = translation_distances(T_rel) * 1000.0 - EXPECTED_DISTANCE_M * 1000.0
+
+    latencies = np.array(latencies)
+    errors = np.array(errors)
+    return {
+        "latency_mean_s": latencies.mean(),
+        "latency_p95_s": np.percentile(latencies, 95),
+        "error_mean_mm": errors.mean() if len(errors) else np.nan,
+        "error_std_mm": errors.std(ddof=1) if len(errors) > 1 else np.nan,
+        "detected": len(errors),
+    }
+
+
+def pareto_front(results):
+    """
+    Indices of the configurations not dominated on (latency, |error mean|, error std):
+    no other configuration is at least as good on all three and better on one.
+    Configurations that lost images are never on the front.
+    """
+    n_images = max(r["detected"] for r in results)
+    costs = np.array([
+        [r["latency_mean_s"], abs(r["error_mean_mm"]), r["error_std_mm"]]
+        if r["detected"] == n_images else [np.inf] * 3
+        for r in results
+    ])
+    front = []
+    for i, c in enumerate(costs):
+        if not np.all(np.isfinite(c)):
+            continue
+        dominated = np.any(np.all(costs <= c, axis=1) & np.any(costs < c, axis=1))
+        if not dominated:
+            front.append(i)
+    return front
+
+
+def choose_profile(results, front, max_std_increase):
+    """
+    Fastest configuration of the front whose error std is at most
+    (1 + max_std_increase) times the best std of the front.
+    """
+    best_std = min(results[i]["error_std_mm"] for i in front)
+    allowed = [i for i in front if results[i]["error_std_mm"] <= best_std * (1.0 + max_std_increase)]
+    return min(allowed, key=lambda i: results[i]["latency_mean_s"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speed/accuracy sweep of the corner refinement parameters.")
+    parser.add_argument("--input-dir", help="image set (default: input_dir of settings.json)")
+    parser.add_argument("--max-images", type=int, default=50, help="images used per configuration")
+    parser.add_argument("--max-std-increase", type=float, default=0.05,
+                        help="accepted relative increase of error std over the most precise configuration")
+    parser.add_argument("--profiles-file", default="detector_profiles.json", help="where the chosen profile is written")
+    parser.add_argument("--name", default="tuned", help="name of the chosen profile")
+    parser.add_argument("--report", default="../../output/refinement_sweep.csv", help="CSV with every configuration")
+    cli = parser.parse_args()
+
+    args = parse_args_from_json()
+    ctx = RunContext(args)
+    # same conditions as a batch worker: one OpenCV thread per process
+    cv2.setNumThreads(1)
+
+    input_dir = cli.input_dir or args.input_dir
+    img_paths = sorted(glob.glob(os.path.join(input_dir, "*.*")))[:cli.max_images]
+    # images are decoded once, so that only detection is timed
+    images = [img for img in (cv2.imread(p, cv2.IMREAD_GRAYSCALE) for p in img_paths) if img is not None]
+    if not images:
+        raise FileNotFoundError(f"No readable images in {input_dir}")
+
+    profiles = refinement_grid()
+    print(f"[INFO] {len(profiles)} configurazioni su {len(images)} immagini")
+    # warm-up run (lazy OpenCV initialisation, caches), so that the first configuration is not penalised
+    evaluate_profile(profiles[0], images[:2], ctx)
+    results = []
+    for idx, profile in enumerate(profiles, start=1):
+        res = evaluate_profile(profile, images, ctx)
+        results.append(res)
+        print(f"[{idx}/{len(profiles)}] {profile} → {res['latency_mean_s'] * 1000:.1f} ms, "
+              f"err={res['error_mean_mm']:+.4f} ± {res['error_std_mm']:.4f} mm ({res['detected']} img)")
+
+    front = pareto_front(results)
+    if not front:
+        raise RuntimeError("No configuration detected both boards in every image")
+
+    # Report of the whole sweep (pareto = 1 for the non-dominated configurations)
+    os.makedirs(os.path.dirname(cli.report), exist_ok=True)
+    with open(cli.report, mode='w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["method", "max_iterations", "min_accuracy", "win_size",
+                         "latency_mean_s", "latency_p95_s", "error_mean_mm", "error_std_mm", "detected", "pareto"])
+        for i, (profile, res) in enumerate(zip(profiles, results)):
+            writer.writerow([
+                profile["cornerRefinementMethod"],
+                profile.get("cornerRefinementMaxIterations", ""),
+                profile.get("cornerRefinementMinAccuracy", ""),
+                profile.get("cornerRefinementWinSize", ""),
+                f"{res['latency_mean_s']:.5f}", f"{res['latency_p95_s']:.5f}",
+                res["error_mean_mm"], res["error_std_mm"], res["detected"], int(i in front)
+            ])
+
+    print("[PARETO]")
+    for i in sorted(front, key=lambda i: results[i]["latency_mean_s"]):
+        print(f"  {profiles[i]} → {results[i]['latency_mean_s'] * 1000:.1f} ms, "
+              f"err={results[i]['error_mean_mm']:+.4f} ± {results[i]['error_std_mm']:.4f} mm")
+
+    # Write the chosen profile back as a detector config
+    chosen = choose_profile(results, front, cli.max_std_increase)
+    profiles_path = cli.profiles_file
+    if not os.path.isabs(profiles_path):
+        profiles_path = os.path.join(os.path.dirname(__file__), profiles_path)
+    stored = {}
+    if os.path.exists(profiles_path):
+        with open(profiles_path, "r") as f:
+            stored = json.load(f)
+    stored[cli.name] = profiles[chosen]
+    with open(profiles_path, "w") as f:
+        json.dump(stored, f, indent=4)
+
+    print(f"[DONE] Profilo '{cli.name}' = {profiles[chosen]} salvato in {profiles_path}")
+    print(f"       Report completo: {cli.report}")
+    print(f'       Per usarlo: "profiles_file": "{cli.profiles_file}", "detector_profile": "{cli.name}"')
+
+
+if __name__ == "__main__":
+    main()
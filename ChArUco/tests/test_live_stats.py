@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from live_stats import RunningStats, DriftAlarm
+
+
+@pytest.mark.parametrize("window", [2, 10, 50])
+def test_running_stats_match_numpy(window):
+    rng = np.random.default_rng(window)
+    # ~130.86 mm with µm spread plus a drifting column: the cases where naive sums lose precision
+    n = 237
+    values = np.column_stack([
+        130.8625232 + rng.normal(0.0, 1e-3, n),
+        rng.normal(0.0, 5.0, n) + np.linspace(0.0, 20.0, n),
+    ])
+    stats = RunningStats(["distance_mm", "error_mm"], window=window)
+    for i, x in enumerate(values, start=1):
+        stats.update(x)
+        seen, last = values[:i], values[max(i - window, 0):i]
+        np.testing.assert_allclose(stats.mean, seen.mean(axis=0), rtol=1e-12)
+        np.testing.assert_allclose(stats.min, seen.min(axis=0))
+        np.testing.assert_allclose(stats.max, seen.max(axis=0))
+        np.testing.assert_allclose(stats.roll_mean, last.mean(axis=0), rtol=1e-12)
+        if i > 1:
+            np.testing.assert_allclose(stats.std, seen.std(axis=0, ddof=1), rtol=1e-7)
+            np.testing.assert_allclose(stats.roll_std, last.std(axis=0, ddof=1), rtol=1e-6, atol=1e-12)
+    assert stats.n == n and stats.window_full
+
+
+def test_drift_alarm_fires_on_rolling_mean():
+    stats = RunningStats(["error_mm"], window=5)
+    alarm = DriftAlarm("error_mm", -0.1, 0.1)
+    messages = []
+    for x in [0.0] * 5 + [0.4] * 5 + [0.0] * 5:
+        stats.update([x])
+        messages.append(alarm.check(stats, "img"))
+    fired = [i for i, m in enumerate(messages) if m]
+    # out of the band once the mean of the last 5 exceeds 0.1 (2nd 0.4), back once it is below again
+    assert fired == [6, 13]
+    assert alarm.events == 1 and not alarm.active
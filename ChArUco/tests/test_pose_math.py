@@ -0,0 +1,60 @@
+import cv2
+import numpy as np
+import pytest
+from scipy.spatial.transform import Rotation
+
+from utils import poses_to_matrices, rotation_matrices_to_quaternions
+
+
+def _rvecs(rng):
+    """
+    Random rotations plus the edge cases of the Rodrigues formula: zero, tiny and ~180° angles.
+    """
+    axes = rng.normal(size=(6, 3))
+    axes /= np.linalg.norm(axes, axis=1, keepdims=True)
+    special = np.concatenate([
+        np.zeros((1, 3)),
+        axes[:2] * 1e-10,
+        axes[2:4] * (np.pi - 1e-9),
+        axes[4:] * np.pi,
+    ])
+    return np.concatenate([rng.uniform(-np.pi, np.pi, (200, 3)), special])
+
+
+def test_poses_to_matrices_matches_cv2_rodrigues():
+    rng = np.random.default_rng(0)
+    rvecs = _rvecs(rng)
+    tvecs = rng.normal(size=(len(rvecs), 3))
+    T = poses_to_matrices(rvecs, tvecs)
+    assert T.shape == (len(rvecs), 4, 4)
+    for rvec, tvec, T_i in zip(rvecs, tvecs, T):
+        R_ref, _ = cv2.Rodrigues(rvec)
+        np.testing.assert_allclose(T_i[:3, :3], R_ref, atol=1e-12)
+        np.testing.assert_array_equal(T_i[:3, 3], tvec)
+        np.testing.assert_array_equal(T_i[3], [0.0, 0.0, 0.0, 1.0])
+
+
+def _rotations(rng):
+    """
+    Random rotations, near-180° rotations (each diagonal element can dominate), exact 180°
+    about the axes, and small angles (trace-dominant branch).
+    """
+    random = Rotation.random(200, random_state=1).as_matrix()
+    axes = rng.normal(size=(30, 3))
+    axes /= np.linalg.norm(axes, axis=1, keepdims=True)
+    near_pi = Rotation.from_rotvec(axes * (np.pi - rng.uniform(0, 1e-3, (30, 1)))).as_matrix()
+    exact_pi = Rotation.from_rotvec(np.eye(3) * np.pi).as_matrix()
+    small = Rotation.from_rotvec(axes * rng.uniform(0, 1e-3, (30, 1))).as_matrix()
+    return np.concatenate([random, near_pi, exact_pi, small, np.eye(3)[None]])
+
+
+@pytest.mark.parametrize("case", ["all", "single"])
+def test_quaternions_match_scipy_including_sign(case):
+    R_mats = _rotations(np.random.default_rng(2))
+    q_ref = Rotation.from_matrix(R_mats).as_quat()
+    if case == "all":
+        q = rotation_matrices_to_quaternions(R_mats)
+    else:
+        q = np.concatenate([rotation_matrices_to_quaternions(R[None]) for R in R_mats])
+    np.testing.assert_allclose(q, q_ref, atol=1e-12)
+    np.testing.assert_allclose(np.linalg.norm(q, axis=1), 1.0, atol=1e-15)
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from main import CSV_HEADER
+from results_io import ColumnarWriter, load_results
+
+
+@pytest.mark.parametrize("n_rows", [0, 1, 7, 8, 1000])
+def test_columnar_round_trip(tmp_path, n_rows):
+    rng = np.random.default_rng(n_rows)
+    values = rng.normal(scale=100.0, size=(n_rows, len(CSV_HEADER) - 1))
+    rows = [[f"img_{i:04d} ß.tiff", *vals[:-1], f"{vals[-1]:.4f}"] for i, vals in enumerate(values)]
+    path = tmp_path / "results.npy"
+
+    # chunks of 8 rows: the rows span full chunks, partial chunks and the final flush
+    with ColumnarWriter(str(path), CSV_HEADER, chunk_rows=8) as writer:
+        writer.writerows(rows)
+
+    results = load_results(str(path))
+    assert isinstance(results, np.memmap)
+    assert results.shape == (n_rows,)
+    assert results.dtype.names == tuple(CSV_HEADER)
+    assert list(results["image_name"]) == [row[0] for row in rows]
+    for k, name in enumerate(CSV_HEADER[1:-1]):
+        np.testing.assert_array_equal(results[name], values[:, k])
+    np.testing.assert_array_equal(results["elapsed_time_s"], [float(row[-1]) for row in rows])
+    # valid .npy also without memory mapping
+    np.testing.assert_array_equal(np.load(str(path)), np.array(results))
+
+
+def test_columnar_close_is_idempotent(tmp_path):
+    path = tmp_path / "results.npy"
+    writer = ColumnarWriter(str(path), CSV_HEADER)
+    writer.writerow(["a", *range(len(CSV_HEADER) - 1)])
+    writer.close()
+    writer.close()
+    assert load_results(str(path)).shape == (1,)
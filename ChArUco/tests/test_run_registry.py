@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from main import CSV_HEADER, ResultSchema
+from run_registry import PAIR_VALUES, RESULT_COLUMNS, RegistryWriter, RunRegistry, row_layout
+
+
+def _rows(header, n_rows, seed=0):
+    values = np.random.default_rng(seed).normal(scale=100.0, size=(n_rows, len(header) - 1))
+    return [[f"img_{i:04d}.tiff", *vals] for i, vals in enumerate(values)]
+
+
+def test_legacy_rows(tmp_path):
+    registry = RunRegistry(str(tmp_path / "runs.sqlite"))
+    rows = _rows(CSV_HEADER, 5)
+    run_id = registry.start_run("charuco")
+    registry.add_rows(run_id, rows)
+
+    stored = registry.measurements(run_id)
+    assert [tuple(row) for row in stored] == [(row[0], *row[1:len(RESULT_COLUMNS) + 1]) for row in rows]
+    pair = registry.measurements(run_id, pair=(1, 2))
+    assert [row[1:] for row in pair] == [row[1:] for row in registry.measurements(run_id, PAIR_VALUES)]
+
+
+def test_n_board_rows_by_pair(tmp_path):
+    schema = ResultSchema(n_boards=4, expected_distances_mm={"C1_C2": 130.0})
+    rows = _rows(schema.header, 6)
+    rows[0][schema.header.index("C3_C4_error_mm")] = np.nan
+    registry = RunRegistry(str(tmp_path / "runs.sqlite"))
+    run_id = registry.start_run("charuco", n_boards=4)
+    writer = RegistryWriter(registry, run_id, row_layout(schema.header), chunk_rows=4)
+    for row in rows:
+        writer.writerow(row)
+    writer.flush()
+
+    assert registry.runs()[0]["n_images"] == 6
+    assert registry.runs()[0]["n_boards"] == 4
+    for i, j in zip(*schema.pairs):
+        pair = (int(i) + 1, int(j) + 1)
+        columns = [f"C{pair[0]}_C{pair[1]}_{c}" for c in ("tx_rel_mm", "distance_mm", "qw_rel")]
+        stored = registry.measurements(run_id, ["tx_rel_mm", "distance_mm", "qw_rel_mm"], pair=pair)
+        expected = [[row[schema.header.index(c)] for c in columns] for row in rows]
+        assert [row[0] for row in stored] == [row[0] for row in rows]
+        np.testing.assert_array_equal([row[1:] for row in stored], expected)
+    # C1/C2 in the 2-board columns, NaN stored as NULL and skipped by the statistics
+    legacy = registry.measurements(run_id, ["M2_tz_mm", "distance_mm", "elapsed_time_s"])
+    np.testing.assert_array_equal(
+        [row[1:] for row in legacy],
+        [[row[schema.header.index(c)] for c in ("M2_tz_mm", "C1_C2_distance_mm", "elapsed_time_s")] for row in rows]
+    )
+    assert registry.column_stats("error_mm", pair=(3, 4))["n"] == 5
+    assert registry.column_stats("distance_mm", pair=(2, 4))["mean"] == pytest.approx(
+        np.mean([row[schema.header.index("C2_C4_distance_mm")] for row in rows]))
@@ -0,0 +1,71 @@
+import cv2
+import numpy as np
+import pytest
+
+from detect_charuco import ARUCO_DICT, CharucoEngine, create_charuco_board_set
+
+CAMERA_MATRIX = np.array([[2000.0, 0.0, 1000.0], [0.0, 2000.0, 800.0], [0.0, 0.0, 1.0]])
+DIST_COEFFS = np.zeros(5)
+
+
+def _engine(n_boards, board_size=3):
+    boards, _, _ = create_charuco_board_set(n_boards, (board_size, board_size), 0.075, 0.75)
+    return CharucoEngine(boards, CAMERA_MATRIX, DIST_COEFFS)
+
+
+def _per_board_loop(engine, corners, ids):
+    return [det.select_markers(corners, ids) for det in engine.board_detectors]
+
+
+def _assert_same_groups(groups, reference):
+    assert len(groups) == len(reference)
+    for (corners, ids), (ref_corners, ref_ids) in zip(groups, reference):
+        if ref_ids is None:
+            assert ids is None and corners == []
+            continue
+        np.testing.assert_array_equal(ids, ref_ids)
+        assert len(corners) == len(ref_corners)
+        for c, ref_c in zip(corners, ref_corners):
+            np.testing.assert_array_equal(c, ref_c)
+
+
+@pytest.mark.parametrize("n_boards", [2, 3, 5])
+def test_split_markers_matches_per_board_loop(n_boards):
+    engine = _engine(n_boards)
+    rng = np.random.default_rng(n_boards)
+    n_dict = len(ARUCO_DICT.bytesList)
+    for n_markers in [0, 1, 5, 40]:
+        # IDs of any board, of no board and repeated ones, in random detector order
+        ids = rng.integers(0, n_dict, size=(n_markers, 1)).astype(np.int32)
+        corners = tuple(rng.uniform(0, 2000, (1, 4, 2)).astype(np.float32) for _ in range(n_markers))
+        _assert_same_groups(engine.split_markers(corners, ids), _per_board_loop(engine, corners, ids))
+    assert engine.split_markers((), None) == [([], None)] * n_boards
+
+
+def test_split_markers_on_detected_boards():
+    engine = _engine(3)
+    tiles = [det.board.generateImage((300, 300), marginSize=20) for det in engine.board_detectors]
+    img = np.full((400, 1100), 255, np.uint8)
+    for i, tile in enumerate(tiles):
+        img[50:350, 50 + i * 350:350 + i * 350] = tile
+    corners, ids = engine.detect_markers(img)
+    groups = engine.split_markers(corners, ids)
+    _assert_same_groups(groups, _per_board_loop(engine, corners, ids))
+    for (_, board_ids), det in zip(groups, engine.board_detectors):
+        assert sorted(board_ids.ravel()) == sorted(det.ids)
+
+
+def test_board_set_ids_are_disjoint_blocks():
+    boards, _, _ = create_charuco_board_set(4, (3, 3), 0.075, 0.75)
+    ids = [board.getIds().ravel() for board in boards]
+    n = len(ids[0])
+    for i, board_ids in enumerate(ids):
+        np.testing.assert_array_equal(board_ids, np.arange(i * n, (i + 1) * n))
+    with pytest.raises(ValueError):
+        create_charuco_board_set(len(ARUCO_DICT.bytesList) // n + 1, (3, 3), 0.075, 0.75)
+
+
+def test_engine_rejects_shared_ids():
+    boards, _, _ = create_charuco_board_set(1, (3, 3), 0.075, 0.75)
+    with pytest.raises(ValueError):
+        CharucoEngine([boards[0], boards[0]], CAMERA_MATRIX, DIST_COEFFS)
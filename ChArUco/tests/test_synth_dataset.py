@@ -0,0 +1,51 @@
+import cv2
+import numpy as np
+import pytest
+
+from utils import CameraModel
+from detect_charuco import create_charuco_boards
+from synth_dataset import SyntheticRenderer, TEXTURE_CORNER_TOL, board_poses_on_plate, sample_plate_pose
+
+IMAGE_SIZE = (640, 480)
+# mild barrel distortion, so that the ray tracing through the camera model is exercised
+CAMERA = CameraModel(np.array([[1400.0, 0.0, 322.0], [0.0, 1400.0, 237.0], [0.0, 0.0, 1.0]]),
+                     np.array([-0.08, 0.05, 0.0, 0.0, 0.0]))
+
+
+def _renderer(board_size, nominal_distance):
+    board1, board2, _, _ = create_charuco_boards((board_size, board_size), 0.075, 0.75)
+    return SyntheticRenderer(CAMERA, board1, board2, 0.075, IMAGE_SIZE, nominal_distance)
+
+
+@pytest.mark.parametrize("board_size", [3, 5])
+@pytest.mark.parametrize("nominal_distance", [0.85, 0.885, 0.925])
+def test_textures_are_exact(board_size, nominal_distance):
+    renderer = _renderer(board_size, nominal_distance)
+    assert round(renderer.ppm * 0.075) % board_size == 0
+    for board, texture in zip(renderer.boards, renderer.textures):
+        assert renderer.texture_corner_error(board, texture) <= TEXTURE_CORNER_TOL
+
+
+@pytest.mark.parametrize("nominal_distance", [0.85, 0.885, 0.9])
+def test_rendered_corners_match_true_pose(nominal_distance):
+    """
+    Inner chessboard corners found in the rendered image (no noise) land where the true
+    pose projects them: within the cornerSubPix bias on a tilted board (~0.1 px), while a texture
+    with squares snapped to whole texels is ~0.5 px off.
+    """
+    renderer = _renderer(3, nominal_distance)
+    rng = np.random.default_rng(0)
+    T_plate = sample_plate_pose(rng, (nominal_distance, nominal_distance), 0.005, 10.0, 5.0, np.zeros(3))
+    T_boards = board_poses_on_plate(T_plate)
+    img = renderer.render(*T_boards, rng, blur_sigma=1.0, noise_sigma=0.0).astype(np.float32)
+
+    criteria = (cv2.TERM_CRITERIA_COUNT | cv2.TERM_CRITERIA_EPS, 100, 1e-6)
+    for board, T_board in zip(renderer.boards, T_boards):
+        rvec, _ = cv2.Rodrigues(T_board[:3, :3])
+        expected, _ = cv2.projectPoints(board.getChessboardCorners(), rvec, T_board[:3, 3],
+                                        CAMERA.camera_matrix, CAMERA.dist_coeffs)
+        expected = expected.reshape(-1, 2).astype(np.float32)
+        found = (expected + 0.5).reshape(-1, 1, 2)
+        cv2.cornerSubPix(img, found, (5, 5), (-1, -1), criteria)
+        error = np.linalg.norm(found.reshape(-1, 2) - expected, axis=1)
+        assert error.max() < 0.15
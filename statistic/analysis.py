@@ -0,0 +1,315 @@
+import os
+import re
+import sqlite3
+import argparse
+import numpy as np
+import pandas as pd
+from glob import glob
+from results_loader import load_results
+
+OUTPUT_DIR = "../output"
+
+# Nome del file di un run: set_<shift>_<system>.csv
+RUN_FILE = re.compile(r"set_(?P<shift>[+-]?\d+)_(?P<system>\w+)\.csv$")
+
+# system → (etichetta, colore) usati da tutti i grafici
+SYSTEMS = {
+    "charuco":     ("ChArUco",     "#d39039"),
+    "charuco_sub": ("ChArUco Sub", "#3976d3"),
+    "halcon":      ("Halcon",      "#91d64d"),
+}
+
+# Gli export Halcon non hanno il suffisso _mm sui quaternioni
+COLUMN_ALIASES = {"qx_rel": "qx_rel_mm", "qy_rel": "qy_rel_mm", "qz_rel": "qz_rel_mm", "qw_rel": "qw_rel_mm"}
+
+INDEX = ["system", "shift", "sample"]
+
+# Coppie di shift (a, b, distanza reale in mm) delle acquisizioni di accuratezza
+ACCURACY_PAIRS = [("0", "+10", 100), ("0", "-10", 100), ("-10", "+10", 200)]
+
+# Colonne di output di pair_accuracy (= accuracy_<system>.csv)
+ACCURACY_COLUMNS = ["pair", "marker", "sample_idx", "dist1_mm", "dist2_mm", "delta_mm", "true_mm", "error_mm"]
+
+MARKER_COLUMN = re.compile(r"M(\d+)_tx_mm$")
+FRAME_NUMBER = re.compile(r"(\d+)\.\w+$")
+
+
+def run_files(output_dir=OUTPUT_DIR):
+    """
+    {(system, shift): path} of every results file in output_dir.
+    """
+    runs = {}
+    for path in sorted(glob(os.path.join(output_dir, "set_*.csv"))):
+        m = RUN_FILE.search(os.path.basename(path))
+        if m:
+            runs[(m["system"], m["shift"])] = path
+    return runs
+
+
+def load_dataset(output_dir=OUTPUT_DIR, systems=None, shifts=None, columns=None):
+    """
+    All the runs in output_dir, read once, as one DataFrame indexed by (system, shift, sample),
+    sample = 1..N within each run. Numeric columns are float64 with the same names in every
+    system (Halcon aliases renamed), so metrics are computed on all runs at once by groupby.
+    """
+    frames = []
+    for (system, shift), path in run_files(output_dir).items():
+        if (systems is not None and system not in systems) or (shifts is not None and shift not in shifts):
+            continue
+        df = load_results(path).rename(columns=COLUMN_ALIASES)
+        if columns is not None:
+            df = df[[c for c in df.columns if c in columns]]
+        df.index = pd.MultiIndex.from_arrays(
+            [np.full(len(df), system), np.full(len(df), shift), np.arange(1, len(df) + 1)], names=INDEX
+        )
+        frames.append(df)
+    if not frames:
+        raise FileNotFoundError(f"Nessun file set_<shift>_<system>.csv in {output_dir}")
+    data = pd.concat(frames)
+    numeric = [c for c in data.columns if c != "image_name"]
+    data[numeric] = data[numeric].astype(np.float64)
+    return data.sort_index()
+
+
+def load_registry(db_path, systems=None, shifts=None, since=None, until=None, pair=None):
+    """
+    The same dataset as load_dataset, from the SQLite run registry (ChArUco/src/run_registry.py)
+    instead of the CSV files: the latest run of every (system, shift) started in [since, until).
+    pair=(i, j): relative pose, distance and error of the boards C<i>, C<j> of N-board runs
+    (with elapsed_time_s) instead of the C1/C2 columns.
+    """
+    clauses, params = [], []
+    for column, values in (("system", systems), ("shift", shifts)):
+        if values is not None:
+            clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    for clause, value in (("started_at >= ?", since), ("started_at < ?", until)):
+        if value is not None:
+            clauses.append(clause)
+            params.append(value)
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    if pair is None:
+        columns, join, order = "m.*", "JOIN measurements m ON m.run_id = l.run_id", "m"
+    else:
+        columns = ("p.run_id, p.image_name, p.tx_rel_mm, p.ty_rel_mm, p.tz_rel_mm, p.distance_mm, p.error_mm, "
+                   "p.qx_rel_mm, p.qy_rel_mm, p.qz_rel_mm, p.qw_rel_mm, m.elapsed_time_s")
+        join = ("JOIN pair_measurements p ON p.run_id = l.run_id AND p.pair_i = ? AND p.pair_j = ? "
+                "JOIN measurements m ON m.run_id = p.run_id AND m.image_name = p.image_name")
+        order = "p"
+        params.extend(pair)
+    query = f"""
+        WITH latest AS (
+            SELECT run_id, system, shift FROM (
+                SELECT run_id, system, shift,
+                       ROW_NUMBER() OVER (PARTITION BY system, shift ORDER BY started_at DESC, run_id DESC) AS rn
+                FROM runs{where}
+            ) WHERE rn = 1 AND shift IS NOT NULL
+        )
+        SELECT l.system, l.shift, {columns} FROM latest l {join}
+        ORDER BY l.system, l.shift, {order}.rowid
+    """
+    with sqlite3.connect(db_path) as conn:
+        data = pd.read_sql_query(query, conn, params=params)
+    if data.empty:
+        raise FileNotFoundError(f"Nessuna run in {db_path} con questi filtri")
+    sample = data.groupby(["system", "shift"], sort=False).cumcount().to_numpy() + 1
+    data.index = pd.MultiIndex.from_arrays([data.pop("system"), data.pop("shift"), sample], names=INDEX)
+    data = data.drop(columns="run_id")
+    numeric = [c for c in data.columns if c != "image_name"]
+    data[numeric] = data[numeric].astype(np.float64)
+    return data.sort_index()
+
+
+def series(data, system, shift, column):
+    """
+    Values of one column of one run, as array (order of acquisition).
+    """
+    return data.loc[(system, shift), column].to_numpy()
+
+
+def describe(data, column, absolute=True):
+    """
+    count, mean, std (popolazione), min, max of a column for every run (system, shift).
+    """
+    values = data[column].abs() if absolute else data[column]
+    grouped = values.groupby(level=["system", "shift"], sort=True)
+    out = grouped.agg(["count", "mean", "min", "max"])
+    out.insert(2, "std", grouped.std(ddof=0))  # come np.std
+    return out
+
+
+def std_spread(data, column, absolute=True):
+    """
+    Per system: mean of the per-run std of a column and its [min, max] over the runs
+    (barre con error bar dei grafici di stabilità).
+    """
+    per_run = describe(data, column, absolute)["std"]
+    return per_run.groupby(level="system").agg(mean="mean", min="min", max="max", runs="count")
+
+
+def repeatability(data):
+    """
+    Per run: statistics of |error_mm| and of distance_mm.
+    """
+    return pd.concat({"error_mm": describe(data, "error_mm"), "distance_mm": describe(data, "distance_mm", False)}, axis=1)
+
+
+def timing(data, percentiles=(50, 90, 99)):
+    """
+    Per run: mean/std and percentiles of elapsed_time_s.
+    """
+    grouped = data["elapsed_time_s"].groupby(level=["system", "shift"])
+    out = describe(data, "elapsed_time_s", False)[["count", "mean", "std"]]
+    for p in percentiles:
+        out[f"p{p}"] = grouped.quantile(p / 100.0)
+    return out
+
+
+def markers(data):
+    """
+    Numbers of the boards with an absolute pose in the dataset (M1_tx_mm, M2_tx_mm, ... → [1, 2, ...]).
+    """
+    return sorted(int(m[1]) for m in map(MARKER_COLUMN.match, data.columns) if m)
+
+
+def marker_distances(data):
+    """
+    Distance camera → board of every board, as DataFrame with the index of data and one column per board.
+    """
+    return pd.DataFrame({
+        m: np.sqrt(np.square(data[[f"M{m}_tx_mm", f"M{m}_ty_mm", f"M{m}_tz_mm"]].to_numpy()).sum(axis=1))
+        for m in markers(data)
+    }, index=data.index)
+
+
+def sample_keys(data, key="sample"):
+    """
+    Key that joins the samples of two shifts: "sample" = position in the run (1..N),
+    "frame" = frame counter at the end of image_name (..._0042.tiff → 42).
+    """
+    if key == "sample":
+        return data.index.get_level_values("sample").to_numpy()
+    if key == "frame":
+        return data["image_name"].str.extract(FRAME_NUMBER, expand=False).astype(np.int64).to_numpy()
+    raise ValueError(f"Chiave di join sconosciuta '{key}' (disponibili: sample, frame)")
+
+
+def all_pairs(shifts, mm_per_shift):
+    """
+    Every pair (a, b) of the given shifts, with true distance |b - a| * mm_per_shift.
+    """
+    shifts = sorted(shifts, key=float)
+    pairs = []
+    for i, a in enumerate(shifts):
+        for b in shifts[i + 1:]:
+            true_mm = round(abs(float(b) - float(a)) * mm_per_shift, 6)
+            pairs.append((a, b, int(true_mm) if true_mm.is_integer() else true_mm))
+    return pairs
+
+
+def pair_accuracy(data, pairs=ACCURACY_PAIRS, key="sample"):
+    """
+    Accuracy of every system on every (shift a, shift b, true_mm) pair: for each board, the
+    distance camera → board of the samples of a and b with the same key (inner join),
+    delta_mm = |dist_b - dist_a| and error_mm = |delta_mm - true_mm|.
+    Returns {system: DataFrame with ACCURACY_COLUMNS}, rows ordered by pair, marker, sample_idx.
+    All the pairs and boards of a system are computed as one (keys × pairs·boards) array.
+    """
+    dist = marker_distances(data)
+    dist.index = pd.MultiIndex.from_arrays(
+        [dist.index.get_level_values("system"), dist.index.get_level_values("shift"), sample_keys(data, key)],
+        names=["system", "shift", "sample_idx"]
+    )
+    if dist.index.duplicated().any():
+        raise ValueError(f"La chiave '{key}' non è univoca all'interno di un run")
+    boards = list(dist.columns)
+    # (system, sample_idx) × (board, shift): NaN dove un run non ha quel campione
+    wide = dist.unstack("shift")
+
+    names = np.array([f"{a}_{b}" for a, b, _ in pairs], dtype=object)
+    true_mm = np.array([t for _, _, t in pairs])
+    cols_a = [(m, a) for a, _, _ in pairs for m in boards]
+    cols_b = [(m, b) for _, b, _ in pairs for m in boards]
+
+    results = {}
+    for system, table in wide.groupby(level="system", sort=False):
+        missing = {c[1] for c in cols_a + cols_b} - set(table.dropna(axis=1, how="all").columns.get_level_values("shift"))
+        if missing:
+            print(f"[WARN] {system}: nessun run per gli shift {', '.join(sorted(missing))}, saltato")
+            continue
+        keys = table.index.get_level_values("sample_idx").to_numpy()
+        # (pairs·boards, keys): la ravel segue l'ordine pair → marker → sample_idx
+        d1 = table[cols_a].to_numpy().T
+        d2 = table[cols_b].to_numpy().T
+        true = np.repeat(true_mm, len(boards))[:, None]
+        delta = np.abs(d2 - d1)
+        error = np.abs(delta - true)
+        valid = ~(np.isnan(d1) | np.isnan(d2)).ravel()
+
+        shape = d1.shape
+        results[system] = pd.DataFrame({
+            "pair": np.repeat(names, len(boards) * shape[1]),
+            "marker": np.tile(np.repeat(boards, shape[1]), len(pairs)),
+            "sample_idx": np.tile(keys, shape[0]),
+            "dist1_mm": d1.ravel(),
+            "dist2_mm": d2.ravel(),
+            "delta_mm": delta.ravel(),
+            "true_mm": np.broadcast_to(true, shape).ravel(),
+            "error_mm": error.ravel(),
+        })[valid].reset_index(drop=True)
+    return results
+
+
+def load_accuracy(path_template="accuracy_graph&data/accuracy_{system}.csv", systems=None):
+    """
+    Output of pre_processing_accuracy.py for every system, as one DataFrame indexed by
+    (system, row) with the columns by name (pair, marker, delta_mm, error_mm, ...).
+    """
+    frames = {}
+    for system in systems or SYSTEMS:
+        path = path_template.format(system=system)
+        if os.path.exists(path):
+            frames[system] = pd.read_csv(path, dtype={"pair": str})
+    if not frames:
+        raise FileNotFoundError(path_template.format(system="*"))
+    return pd.concat(frames, names=["system", "row"])
+
+
+def accuracy(acc):
+    """
+    Per system and pair: statistics of |error_mm| and mean measured delta.
+    """
+    keys = [acc.index.get_level_values("system"), acc["pair"]]
+    out = acc["error_mm"].abs().groupby(keys, sort=False).agg(["count", "mean", "std", "max"])
+    grouped = acc.groupby(keys, sort=False)
+    out["delta_mean_mm"] = grouped["delta_mm"].mean()
+    out["true_mm"] = grouped["true_mm"].first()
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Metriche di ripetibilità, stabilità, tempi e accuratezza.")
+    parser.add_argument("--registry", help="database SQLite delle run invece dei file set_*.csv")
+    parser.add_argument("--since", help="con --registry: run a partire da questa data ISO")
+    parser.add_argument("--until", help="con --registry: run prima di questa data ISO")
+    parser.add_argument("--pair", type=int, nargs=2, metavar=("I", "J"),
+                        help="con --registry: coppia di board C<I>_C<J> delle run a N board (default: C1_C2)")
+    cli = parser.parse_args()
+
+    pair = tuple(cli.pair) if cli.pair else None
+    data = (load_registry(cli.registry, since=cli.since, until=cli.until, pair=pair) if cli.registry
+            else load_dataset())
+    pd.set_option("display.width", 200)
+    print("=== Ripetibilità ===")
+    print(repeatability(data).round(4))
+    print("\n=== Stabilità (std di |error_mm| per run) ===")
+    print(std_spread(data, "error_mm").round(4))
+    print("\n=== Tempi di elaborazione (s) ===")
+    print(timing(data).round(4))
+    try:
+        acc = load_accuracy()
+    except FileNotFoundError as e:
+        print(f"\n[WARN] Nessun dato di accuratezza ({e}): eseguire pre_processing_accuracy.py")
+    else:
+        print("\n=== Accuratezza ===")
+        print(accuracy(acc).round(4))
@@ -1,72 +1,45 @@
-import pandas as pd
-import numpy as np
-from glob import glob
+import os
+import argparse
+from analysis import OUTPUT_DIR, ACCURACY_PAIRS, ACCURACY_COLUMNS, load_dataset, all_pairs, pair_accuracy
 
-# Configurazione sistemi e path
-systems = {
-    'charuco':    "../output/set_{shift}_charuco.csv",
-    'charuco_sub':"../output/set_{shift}_charuco_sub.csv",
-    'halcon':     "../output/set_{shift}_halcon.csv"
-}
-shifts = ['0', '+10', '-10']
 
-# Definizione delle coppie e delle distanze reali
-pairs = [
-    ('0',  '+10', 100),
-    ('0',  '-10', 100),
-    ('-10','+10', 200)
-]
+def parse_pairs(values):
+    # ["0", "+10", "100", ...] → [("0", "+10", 100), ...]
+    if len(values) % 3:
+        raise argparse.ArgumentTypeError("--pair vuole terne: SHIFT_A SHIFT_B TRUE_MM")
+    pairs = []
+    for a, b, true_mm in zip(values[0::3], values[1::3], values[2::3]):
+        true_mm = float(true_mm)
+        pairs.append((a, b, int(true_mm) if true_mm.is_integer() else true_mm))
+    return pairs
 
-# Funzione per calcolare la distanza Euclidea di un marker
-def compute_distances(df):
-    # Marker 1 colonne
-    df['dist_marker_1'] = np.sqrt(
-        df['M1_tx_mm']**2 + df['M1_ty_mm']**2 + df['M1_tz_mm']**2
-    )
-    # Marker 2 colonne
-    df['dist_marker_2'] = np.sqrt(
-        df['M2_tx_mm']**2 + df['M2_ty_mm']**2 + df['M2_tz_mm']**2
-    )
-    return df
 
-# Loop su ciascun sistema
-for system_name, template in systems.items():
-    # Carica e processa i tre DataFrame
-    dfs = {}
-    for shift in shifts:
-        path = template.format(shift=shift)
-        df = pd.read_csv(path)
-        df = compute_distances(df)
-        dfs[shift] = df
+def main():
+    parser = argparse.ArgumentParser(description="Accuratezza per coppie di shift (accuracy_<system>.csv).")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="cartella dei set_<shift>_<system>.csv")
+    parser.add_argument("--dest", default=".", help="cartella dei file accuracy_<system>.csv")
+    parser.add_argument("--systems", nargs="+", help="default: tutti quelli trovati")
+    parser.add_argument("--pair", nargs="+", metavar="SHIFT_A SHIFT_B TRUE_MM",
+                        help="coppie e distanza reale (default: 0 +10 100, 0 -10 100, -10 +10 200)")
+    parser.add_argument("--all-pairs", type=float, metavar="MM_PER_SHIFT",
+                        help="tutte le coppie degli shift trovati, distanza reale = |b - a| × MM_PER_SHIFT")
+    parser.add_argument("--key", default="sample", choices=["sample", "frame"],
+                        help="join dei campioni: posizione nel run o numero di frame nel nome immagine")
+    cli = parser.parse_args()
 
-    # Costruisci lista di righe per il DataFrame di output
-    rows = []
-    for a, b, true_dist in pairs:
-        df_a = dfs[a]; df_b = dfs[b]
-        # Assumiamo stessa lunghezza e allineamento dei campioni
-        for marker in [1, 2]:
-            col = f'dist_marker_{marker}'
-            dist_a = df_a[col].values
-            dist_b = df_b[col].values
-            # Differenza per campione
-            delta = np.abs(dist_b - dist_a)
-            # Errore assoluto rispetto a true_dist per campione
-            error = np.abs(delta - true_dist)
-            # Aggiungi ogni campione come riga
-            for i, (d1, d2, d, e) in enumerate(zip(dist_a, dist_b, delta, error), start=1):
-                rows.append({
-                    'pair':         f'{a}_{b}',
-                    'marker':       marker,
-                    'sample_idx':   i,
-                    'dist1_mm':     d1,
-                    'dist2_mm':     d2,
-                    'delta_mm':     d,
-                    'true_mm':      true_dist,
-                    'error_mm':     e
-                })
+    data = load_dataset(cli.output_dir, systems=cli.systems)
+    if cli.all_pairs is not None:
+        pairs = all_pairs(data.index.get_level_values("shift").unique(), cli.all_pairs)
+    elif cli.pair:
+        pairs = parse_pairs(cli.pair)
+    else:
+        pairs = ACCURACY_PAIRS
 
-    # Crea DataFrame finale e salva CSV
-    out_df = pd.DataFrame(rows)
-    out_filename = f'accuracy_{system_name}.csv'
-    out_df.to_csv(out_filename, index=False)
-    print(f"Saved accuracy results for {system_name} to {out_filename}")
+    for system_name, out_df in pair_accuracy(data, pairs, key=cli.key).items():
+        out_filename = os.path.join(cli.dest, f'accuracy_{system_name}.csv')
+        out_df[ACCURACY_COLUMNS].to_csv(out_filename, index=False)
+        print(f"Saved accuracy results for {system_name} to {out_filename}")
+
+
+if __name__ == "__main__":
+    main()
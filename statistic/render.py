@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import importlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use("Agg")  # headless: nessuna finestra, solo PNG
+
+from analysis import SYSTEMS, OUTPUT_DIR, ACCURACY_PAIRS, ACCURACY_COLUMNS, run_files, load_dataset, load_accuracy, pair_accuracy
+
+ACCURACY_DIR = "accuracy_graph&data"
+ACCURACY_TEMPLATE = os.path.join(ACCURACY_DIR, "accuracy_{system}.csv")
+
+# Signature degli input di ogni figura disegnata (stato dell'ultimo render)
+MANIFEST_PATH = ".render_manifest.json"
+
+# modulo dei grafici → (cartella dei PNG, dati su cui lavorano le sue FIGURES)
+VIEWS = {
+    "plot_precision": ("precision_graph", "runs"),
+    "plot_elapse_time": ("time_graph", "runs"),
+    "plot_accuracy": (ACCURACY_DIR, "accuracy"),
+}
+
+# dati già caricati nel processo worker (uno per tipo)
+_DATA = {}
+
+
+def file_signature(path):
+    # size + mtime: basta a riconoscere un CSV riscritto senza rileggerlo
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def code_signature(module):
+    # sha1 del modulo dei grafici e di analysis.py: un grafico modificato va ridisegnato
+    h = hashlib.sha1()
+    for name in (module, "analysis", "results_loader"):
+        with open(f"{name}.py", "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def input_files(kind, output_dir):
+    """
+    {key: path} of the files a view reads: (system, shift) → run CSV, or system → accuracy CSV.
+    """
+    if kind == "runs":
+        return run_files(output_dir)
+    # stessi file letti da load_accuracy
+    files = {s: ACCURACY_TEMPLATE.format(system=s) for s in SYSTEMS}
+    return {s: p for s, p in files.items() if os.path.exists(p)}
+
+
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def refresh_accuracy(output_dir, manifest, force=False):
+    """
+    Rigenera accuracy_<system>.csv (coppie di default) se i run da cui dipende sono cambiati.
+    Restituisce i sistemi rigenerati.
+    """
+    runs = run_files(output_dir)
+    updated = []
+    stale = {}
+    for system in {system for system, _ in runs}:
+        target = ACCURACY_TEMPLATE.format(system=system)
+        signature = {"inputs": {p: file_signature(p) for (s, _), p in sorted(runs.items()) if s == system},
+                     "code": code_signature("pre_processing_accuracy")}
+        if force or not os.path.exists(target) or manifest.get(target) != signature:
+            stale[system] = (target, signature)
+    if not stale:
+        return updated
+    shifts = {shift for a, b, _ in ACCURACY_PAIRS for shift in (a, b)}
+    data = load_dataset(output_dir, systems=set(stale), shifts=shifts)
+    for system, out_df in pair_accuracy(data, ACCURACY_PAIRS).items():
+        target, signature = stale[system]
+        out_df[ACCURACY_COLUMNS].to_csv(target, index=False)
+        manifest[target] = signature
+        updated.append(system)
+    return updated
+
+
+def plan(output_dir, manifest, only=None, force=False):
+    """
+    Figures to draw: [(module, figure name, png path, signature)], those whose PNG is missing
+    or whose input CSVs / plotting code changed since the last render.
+    """
+    tasks = []
+    for module_name, (out_dir, kind) in VIEWS.items():
+        module = importlib.import_module(module_name)
+        inputs = input_files(kind, output_dir)
+        if not inputs:
+            print(f"[WARN] {module_name}: nessun file di input, saltato")
+            continue
+        signatures = {key: file_signature(path) for key, path in inputs.items()}
+        code = code_signature(module_name)
+        for name in module.FIGURES:
+            png = os.path.join(out_dir, f"{name}.png")
+            if only and name not in only:
+                continue
+            depends = getattr(module, "DEPENDS", {}).get(name, inputs)
+            signature = {"inputs": {inputs[k]: signatures[k] for k in depends if k in inputs}, "code": code}
+            if force or not os.path.exists(png) or manifest.get(png) != signature:
+                tasks.append((module_name, name, png, signature))
+    return tasks
+
+
+def draw(module_name, name, png, output_dir):
+    """
+    Worker: builds one figure and writes it as PNG. The dataset is loaded once per process.
+    """
+    import matplotlib.pyplot as plt
+    kind = VIEWS[module_name][1]
+    if kind not in _DATA:
+        _DATA[kind] = load_dataset(output_dir) if kind == "runs" else load_accuracy(ACCURACY_TEMPLATE)
+    start_t = time.perf_counter()
+    fig = getattr(importlib.import_module(module_name), "FIGURES")[name](_DATA[kind])
+    os.makedirs(os.path.dirname(png), exist_ok=True)
+    fig.savefig(png)
+    plt.close(fig)
+    return png, time.perf_counter() - start_t
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ridisegna (headless, in parallelo) solo le figure con input cambiati.")
+    parser.add_argument("--output-dir", help=f"cartella dei set_<shift>_<system>.csv (default: {OUTPUT_DIR} da statistic/)")
+    parser.add_argument("--jobs", type=int, default=0, help="processi (0 = tutti i core)")
+    parser.add_argument("--force", action="store_true", help="ridisegna tutto")
+    parser.add_argument("--only", nargs="+", help="solo queste figure (nomi delle FIGURES)")
+    parser.add_argument("--accuracy", action="store_true",
+                        help="prima rigenera accuracy_<system>.csv (coppie di default) se i run sono cambiati")
+    cli = parser.parse_args()
+
+    # --output-dir relativo alla cartella corrente; i path di VIEWS e del manifest a questa cartella
+    cli.output_dir = os.path.abspath(cli.output_dir) if cli.output_dir else OUTPUT_DIR
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    start_t = time.perf_counter()
+    manifest = load_manifest()
+
+    if cli.accuracy:
+        for system in refresh_accuracy(cli.output_dir, manifest, cli.force):
+            print(f"[INFO] Aggiornato {ACCURACY_TEMPLATE.format(system=system)}")
+        save_manifest(manifest)
+
+    tasks = plan(cli.output_dir, manifest, cli.only, cli.force)
+    if not tasks:
+        print(f"[INFO] Tutte le figure sono aggiornate ({time.perf_counter() - start_t:.2f} s)")
+        return
+
+    jobs = min(cli.jobs or os.cpu_count() or 1, len(tasks))
+    signatures = {png: signature for _, _, png, signature in tasks}
+    failed = 0
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(draw, module, name, png, cli.output_dir): png for module, name, png, _ in tasks}
+        for future in as_completed(futures):
+            png = futures[future]
+            try:
+                _, elapsed = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[ERROR] {png}: {e}")
+                continue
+            # salvato subito: un render interrotto riprende dalle figure mancanti
+            manifest[png] = signatures[png]
+            save_manifest(manifest)
+            print(f"[INFO] {png} ({elapsed:.2f} s)")
+
+    print(f"[INFO] {len(tasks) - failed}/{len(tasks)} figure ridisegnate con {jobs} processi "
+          f"in {time.perf_counter() - start_t:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import os
+import numpy as np
+import pandas as pd
+
+
+def columnar_path(csv_path):
+    """
+    Path of the columnar copy of a results CSV (same name, .npy extension),
+    as written by main.py with "output_columnar".
+    """
+    return os.path.splitext(csv_path)[0] + ".npy"
+
+
+def load_columns(csv_path):
+    """
+    Memory-mapped structured array of a run, or None if there is no up-to-date .npy copy.
+    arr["error_mm"] is a zero-copy view of that column.
+    """
+    npy_path = columnar_path(csv_path)
+    if not os.path.exists(npy_path):
+        return None
+    if os.path.exists(csv_path) and os.path.getmtime(npy_path) < os.path.getmtime(csv_path):
+        # CSV rewritten after the columnar copy → the copy is stale
+        return None
+    return np.load(npy_path, mmap_mode="r")
+
+
+def load_results(csv_path, columns=None):
+    """
+    Loads a results file as DataFrame with the same columns (and order) as the CSV.
+    Uses the memory-mapped .npy copy when available (no text parsing, only the
+    requested columns are read), otherwise falls back to pd.read_csv.
+    """
+    arr = load_columns(csv_path)
+    if arr is None:
+        return pd.read_csv(csv_path, usecols=columns)
+    names = [n for n in arr.dtype.names if columns is None or n in columns]
+    return pd.DataFrame({n: arr[n] for n in names}, copy=False)